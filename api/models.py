@@ -9,4 +9,4 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
-        ordering = ["-created_at", "-updated_at"]
+        ordering = ["-created_at", "-updated_at", "-id"]
@@ -81,6 +81,29 @@ DATABASES = {
     }
 }
 
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+CORE_RESPONSE_CACHE_TIMEOUT = int(os.getenv("CORE_RESPONSE_CACHE_TIMEOUT", 60 * 60))
+
+# dotted path of the search backend, picked from the database vendor when empty
+CORE_SEARCH_BACKEND = os.getenv("CORE_SEARCH_BACKEND")
+# answer the core list and detail reads from an in-memory copy of the data
+CORE_MEMORY_READS = bool(os.getenv("CORE_MEMORY_READS", default=0))
+
 STORAGES = {
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -95,6 +118,15 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'api.exception_handler.custom_exception_handler',
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SIMPLE_JWT = {
@@ -128,6 +160,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+SWAPI_BASE_URL = os.getenv("SWAPI_BASE_URL", "https://swapi.info/api/")
+SWAPI_TIMEOUT = int(os.getenv("SWAPI_TIMEOUT", 30))
+SWAPI_CACHE_DIR = os.getenv("SWAPI_CACHE_DIR", BASE_DIR / ".swapi_cache")
+SWAPI_CACHE_TTL = int(os.getenv("SWAPI_CACHE_TTL", 5 * 60))
+
+SYNC_JOBS_BROKER_URL = os.getenv("SYNC_JOBS_BROKER_URL", REDIS_URL)
+SYNC_JOBS_EAGER = bool(os.getenv("SYNC_JOBS_EAGER", default=0))
+SYNC_JOBS_PROGRESS_TIMEOUT = 60 * 60
+SYNC_JOBS_STALE_AFTER = int(os.getenv("SYNC_JOBS_STALE_AFTER", 60 * 60))
+
 SILKY_PYTHON_PROFILER = True
 SILKY_META = True
 
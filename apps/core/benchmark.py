@@ -0,0 +1,299 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+from .compiled import CompiledSerializer
+from .expansion import related_lookups
+from .models import Film
+from .serializers import CharacterReadOnlySerializer, FilmReadOnlySerializer, StarshipReadOnlySerializer
+from .sync_data import SWAPI_RESOURCES, load_resources, sync
+
+
+# size of the real swapi.info catalog
+CATALOG_SIZE = {
+    "planets": 60,
+    "species": 37,
+    "people": 82,
+    "vehicles": 39,
+    "starships": 36,
+    "films": 6,
+}
+
+# how many links of each kind a film has upstream, as (min, max)
+FILM_LINKS = {
+    "characters": ("people", 18, 40),
+    "planets": ("planets", 3, 13),
+    "starships": ("starships", 5, 12),
+    "vehicles": ("vehicles", 4, 10),
+    "species": ("species", 5, 15),
+}
+
+
+# field changed on a tenth of the records by the "changed" scenario
+EDITED_FIELDS = {
+    "planets": "climate",
+    "species": "language",
+    "people": "hair_color",
+    "vehicles": "model",
+    "starships": "model",
+    "films": "producer",
+}
+
+
+def generate_dataset(scale, base_url="https://swapi.info/api/", seed=0):
+    rng = random.Random(seed)
+    counts = {resource: max(1, round(size * scale)) for resource, size in CATALOG_SIZE.items()}
+    urls = {
+        resource: [f"{base_url}{resource}/{index}/" for index in range(1, counts[resource] + 1)]
+        for resource in SWAPI_RESOURCES
+    }
+
+    def pick(resource, low, high):
+        return rng.sample(urls[resource], min(rng.randint(low, high), counts[resource]))
+
+    dataset = {resource: [] for resource in SWAPI_RESOURCES}
+    for index, url in enumerate(urls["planets"], 1):
+        dataset["planets"].append({
+            "name": f"Planet {index}",
+            "rotation_period": str(rng.randint(10, 40)),
+            "orbital_period": str(rng.randint(200, 500)),
+            "diameter": str(rng.randint(1000, 20000)),
+            "climate": rng.choice(["arid", "temperate", "frozen", "murky", "temperate, tropical"]),
+            "gravity": "1 standard",
+            "terrain": rng.choice(["desert", "grasslands, mountains", "jungle", "ocean", "tundra"]),
+            "surface_water": str(rng.randint(0, 100)),
+            "population": rng.choice(["unknown", str(rng.randint(1000, 10 ** 12))]),
+            "url": url,
+        })
+    for index, url in enumerate(urls["species"], 1):
+        dataset["species"].append({
+            "name": f"Species {index}",
+            "classification": rng.choice(["mammal", "reptile", "amphibian", "artificial"]),
+            "designation": "sentient",
+            "average_height": str(rng.randint(50, 250)),
+            "skin_colors": "green, grey",
+            "hair_colors": "none",
+            "eye_colors": "black",
+            "average_lifespan": str(rng.randint(50, 1000)),
+            "homeworld": rng.choice(urls["planets"]),
+            "language": f"Language {index}",
+            "url": url,
+        })
+    for index, url in enumerate(urls["people"], 1):
+        dataset["people"].append({
+            "name": f"Character {index}",
+            "height": str(rng.randint(60, 250)),
+            "mass": rng.choice(["unknown", str(rng.randint(20, 150))]),
+            "hair_color": rng.choice(["black", "brown", "blond", "none"]),
+            "skin_color": rng.choice(["fair", "light", "dark", "green"]),
+            "eye_color": rng.choice(["blue", "brown", "yellow"]),
+            "birth_year": f"{rng.randint(0, 900)}BBY",
+            "gender": rng.choice(["male", "female", "n/a"]),
+            "homeworld": rng.choice(urls["planets"]),
+            "species": pick("species", 0, 1),
+            "url": url,
+        })
+    for resource, class_field, kind in [("vehicles", "vehicle_class", "wheeled"), ("starships", "starship_class", "Starfighter")]:
+        for index, url in enumerate(urls[resource], 1):
+            item = {
+                "name": f"{resource.title()} {index}",
+                "model": f"Model {index}",
+                "manufacturer": rng.choice(["Corellia Mining Corporation", "Kuat Drive Yards", "Incom Corporation"]),
+                "cost_in_credits": rng.choice(["unknown", str(rng.randint(10000, 10 ** 9))]),
+                "length": str(rng.randint(5, 2000)),
+                "max_atmosphering_speed": str(rng.randint(100, 1500)),
+                "crew": str(rng.randint(1, 50)),
+                "passengers": str(rng.randint(0, 500)),
+                "cargo_capacity": rng.choice(["none", str(rng.randint(10, 10 ** 6))]),
+                "consumables": f"{rng.randint(1, 12)} months",
+                class_field: kind,
+                "pilots": pick("people", 0, 3),
+                "url": url,
+            }
+            if resource == "starships":
+                item["hyperdrive_rating"] = str(rng.choice([0.5, 1.0, 2.0, 4.0]))
+                item["MGLT"] = str(rng.randint(10, 120))
+            dataset[resource].append(item)
+    for index, url in enumerate(urls["films"], 1):
+        film = {
+            "title": f"Film {index}",
+            "episode_id": index,
+            "opening_crawl": "It is a period of civil war. " * 20,
+            "director": "George Lucas",
+            "producer": "Rick McCallum",
+            "release_date": f"{1977 + index % 50}-05-25",
+            "url": url,
+        }
+        for key, (resource, low, high) in FILM_LINKS.items():
+            film[key] = pick(resource, low, high)
+        dataset["films"].append(film)
+    return dataset
+
+
+class StandInServer:
+    # serves a generated dataset the same way swapi.info serves the real one,
+    # with ETags so that conditional requests can be measured too
+    def __init__(self, dataset=None):
+        self.bodies = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler_class())
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+        if dataset is not None:
+            self.publish(dataset)
+
+    def publish(self, dataset):
+        for resource, items in dataset.items():
+            body = json.dumps(items).encode()
+            self.bodies[f"/api/{resource}/"] = (body, f'"{hashlib.md5(body).hexdigest()}"')
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path not in server.bodies:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                body, etag = server.bodies[self.path]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PhaseRecorder:
+    # sync progress callback that records the time and the number of queries of every phase
+    def __init__(self):
+        self.phases = {}
+        self.current = None
+        self.started = None
+
+    def __call__(self, phase, state):
+        if state == "running":
+            self.current = phase
+            self.started = time.perf_counter()
+            self.phases[phase] = {"seconds": 0.0, "queries": 0}
+        else:
+            self.phases[phase]["seconds"] = time.perf_counter() - self.started
+            self.current = None
+
+    def count_query(self, execute, sql, params, many, context):
+        if self.current is not None:
+            self.phases[self.current]["queries"] += 1
+        return execute(sql, params, many, context)
+
+
+def timed_sync(base_url, cache_dir=None):
+    recorder = PhaseRecorder()
+    with override_settings(SWAPI_BASE_URL=base_url, SWAPI_CACHE_DIR=cache_dir, SWAPI_CACHE_TTL=0):
+        with connection.execute_wrapper(recorder.count_query):
+            started = time.perf_counter()
+            report = sync(recorder)
+            seconds = time.perf_counter() - started
+    return {
+        "seconds": seconds,
+        "queries": sum(phase["queries"] for phase in recorder.phases.values()),
+        "phases": recorder.phases,
+        "report": report,
+    }
+
+
+def run_benchmark(scale, cache_dir=None):
+    # cold: empty database, warm: the same data again, changed: a tenth of the records edited
+    results = {}
+    with StandInServer() as server:
+        dataset = generate_dataset(scale, base_url=server.base_url)
+        server.publish(dataset)
+        results["cold"] = timed_sync(server.base_url, cache_dir)
+        results["warm"] = timed_sync(server.base_url, cache_dir)
+
+        for resource, items in dataset.items():
+            for item in items[::10]:
+                item[EDITED_FIELDS[resource]] += " (edited)"
+        server.publish(dataset)
+        results["changed"] = timed_sync(server.base_url, cache_dir)
+    return results
+
+
+def timed_render(render, repeat):
+    times = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = JSONRenderer().render(render())
+            times.append(time.perf_counter() - started)
+    return {"seconds": min(times), "queries": len(queries.captured_queries) // repeat, "bytes": len(body)}, body
+
+
+def run_serializer_benchmark(scale, repeat=5):
+    # renders every row of each read serializer through DRF and through the
+    # compiled serializer, queries included, keeping the best of `repeat` runs
+    load_resources(generate_dataset(scale))
+    results = {}
+    for serializer_class in [CharacterReadOnlySerializer, StarshipReadOnlySerializer, FilmReadOnlySerializer]:
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        select, prefetch = related_lookups(serializer, model)
+        compiled = CompiledSerializer(serializer)
+
+        drf, drf_body = timed_render(
+            lambda: serializer_class(model.objects.select_related(*select).prefetch_related(*prefetch), many=True).data,
+            repeat,
+        )
+        fast, fast_body = timed_render(lambda: compiled.render(list(compiled.values(model.objects.all()))), repeat)
+        results[model._meta.model_name] = {"drf": drf, "compiled": fast, "identical": drf_body == fast_body}
+    return results
+
+
+def run_renderer_benchmark(scale, repeat=5):
+    # renders the full film list payload with each renderer, keeping the best of `repeat` runs
+    load_resources(generate_dataset(scale))
+    serializer = FilmReadOnlySerializer()
+    select, prefetch = related_lookups(serializer, Film)
+    data = FilmReadOnlySerializer(Film.objects.select_related(*select).prefetch_related(*prefetch), many=True).data
+
+    results = {}
+    for renderer in [JSONRenderer(), FastJSONRenderer()]:
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = renderer.render(data)
+            times.append(time.perf_counter() - started)
+        results[type(renderer).__name__] = {"seconds": min(times), "bytes": len(body), "body": body}
+
+    bodies = {result.pop("body") for result in results.values()}
+    return {"renderers": results, "identical": len(bodies) == 1}
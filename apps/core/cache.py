@@ -0,0 +1,190 @@
+import hashlib
+import math
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+from .models import *
+
+
+# models whose data ends up in the read responses of each model, so that
+# a change to a planet also invalidates the cached species, characters, etc.
+DEPENDENCIES = {
+    Planet: [Planet],
+    Species: [Species, Planet],
+    Character: [Character, Planet, Species],
+    Vehicle: [Vehicle, Character, Planet, Species],
+    Starship: [Starship, Character, Planet, Species],
+    Film: [Film, Character, Planet, Species, Starship, Vehicle],
+}
+
+
+# identifies the generations currently in the cache, replaced whenever one of
+# them has to start over because it was evicted
+EPOCH_KEY = "core:epoch"
+
+
+def generation_key(model):
+    return f"core:generation:{model._meta.label_lower}"
+
+
+def modified_key(model):
+    return f"core:modified:{model._meta.label_lower}"
+
+
+def get_generations(models):
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    return [generations.get(key, 0) for key in keys]
+
+
+def get_version(models):
+    # changes with every write to one of the models, the epoch tells apart the
+    # generations counted again after an eviction
+    epoch = cache.get(EPOCH_KEY)
+    if epoch is None:
+        cache.add(EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+        epoch = cache.get(EPOCH_KEY)
+    return (epoch, *get_generations(models))
+
+
+def get_dataset_version():
+    # changes with every write to a core model: the generations with the writes
+    # of this process right away, the version stored in the database with the
+    # writes committed by any process
+    stored = DatasetVersion.objects.values_list("version", flat=True).first()
+    return (stored or 0, *get_version(DEPENDENCIES))
+
+
+def bump_dataset_version():
+    if not DatasetVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        DatasetVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+def get_last_modified(models):
+    # timestamp of the last bump of any of the models, None if unknown
+    return max(cache.get_many([modified_key(model) for model in models]).values(), default=None)
+
+
+def bump(*models):
+    for model in models:
+        key = generation_key(model)
+        if cache.add(key, 0, timeout=None):
+            cache.delete(EPOCH_KEY)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # evicted between add() and incr()
+            cache.set(key, 1, timeout=None)
+            cache.delete(EPOCH_KEY)
+        cache.set(modified_key(model), time.time(), timeout=None)
+
+
+def bump_on_commit(*models):
+    # bumping right away keeps reads inside the transaction fresh, bumping again
+    # on commit drops what concurrent readers cached before the commit. The
+    # stored version is only bumped on commit, so that the row is not locked
+    # for the rest of a long transaction such as a sync.
+    bump(*models)
+    transaction.on_commit(lambda: committed(models))
+
+
+def committed(models):
+    bump(*models)
+    bump_dataset_version()
+
+
+def get_cache_scope(request):
+    return "staff" if request.user.is_staff else "user"
+
+
+def response_cache_key(request, model):
+    version = get_version(DEPENDENCIES[model])
+    query = sorted(request.query_params.lists())
+    # the pagination links in the data are absolute, so the scheme and host are part of the key
+    raw_key = f"{request.build_absolute_uri(request.path)}|{query}|{get_cache_scope(request)}|{version}"
+    return f"core:response:v3:{hashlib.sha256(raw_key.encode()).hexdigest()}"
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+class CachedResponseMixin:
+    # serves list and retrieve from the cache, keyed on the version of every
+    # model the response depends on so that a write never serves stale data
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, view, request, *args, **kwargs):
+        key = response_cache_key(request, self.queryset.model)
+        cached = cache.get(key)
+        if cached is not None:
+            # the validators are cached with the data so that a hit can answer 304 too
+            data, etag, last_modified = cached
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            return set_validators(response or Response(data), etag, last_modified)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            validators = (response.get("ETag"), parse_http_date_safe(response.get("Last-Modified")))
+            cache.set(key, (response.data, *validators), timeout=settings.CORE_RESPONSE_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalResponseMixin:
+    # ETag and Last-Modified for list and retrieve, from the row count and latest
+    # updated_at of the rows and the version of the models they embed, so
+    # that a matching If-None-Match / If-Modified-Since gets a 304 before anything
+    # is fetched or rendered. Goes inside CachedResponseMixin, which keeps the
+    # validators of the responses it caches.
+    def list(self, request, *args, **kwargs):
+        validators = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            count=Count("pk"), updated_at=Max("updated_at")
+        )
+        return self.conditional_response(super().list, validators, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = self.filter_queryset(self.get_queryset()).prefetch_related(None).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).values_list("updated_at", flat=True).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            updated_at = None
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(super().retrieve, {"updated_at": updated_at}, request, *args, **kwargs)
+
+    def conditional_response(self, view, validators, request, *args, **kwargs):
+        models = DEPENDENCIES[self.queryset.model]
+        raw_etag = f"{request.build_absolute_uri()}|{validators}|{get_version(models)}"
+        etag = f'"{hashlib.sha256(raw_etag.encode()).hexdigest()[:32]}"'
+        timestamps = [get_last_modified(models)]
+        if validators["updated_at"] is not None:
+            timestamps.append(validators["updated_at"].timestamp())
+        last_modified = max([timestamp for timestamp in timestamps if timestamp is not None], default=None)
+        if last_modified is not None:
+            # rounded up, a change later in the same second must not match
+            last_modified = math.ceil(last_modified)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return set_validators(response, etag, last_modified)
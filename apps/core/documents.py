@@ -0,0 +1,118 @@
+import json
+import threading
+from collections import defaultdict
+from functools import cache
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+from .compiled import compile_serializer
+from .expansion import nested_serializer
+from .models import Film, FilmDocument
+from .serializers import FilmReadOnlySerializer
+
+
+# films waiting for their documents to be rebuilt when the transaction commits
+pending = threading.local()
+
+
+def render_documents(film_ids=None):
+    compiled = compile_serializer(FilmReadOnlySerializer, None, None)
+    queryset = Film.objects.all() if film_ids is None else Film.objects.filter(pk__in=film_ids)
+    rows = list(compiled.values(queryset))
+    return {
+        row["id"]: json.dumps(document, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+        for row, document in zip(rows, compiled.render(rows))
+    }
+
+
+def build_documents(film_ids=None):
+    documents = render_documents(film_ids)
+    FilmDocument.objects.bulk_create(
+        [FilmDocument(film_id=film_id, document=document) for film_id, document in documents.items()],
+        update_conflicts=True,
+        unique_fields=["film"],
+        update_fields=["document", "built_at"],
+    )
+    return documents
+
+
+def get_documents(film_ids):
+    # documents missing since the last rebuild are built on the way
+    documents = dict(FilmDocument.objects.filter(film_id__in=film_ids).values_list("film_id", "document"))
+    missing = [film_id for film_id in film_ids if film_id not in documents]
+    if missing:
+        documents.update(build_documents(missing))
+    return documents
+
+
+def check_documents(fix=False):
+    # compares the stored documents with freshly rendered ones
+    expected = render_documents()
+    stored = dict(FilmDocument.objects.values_list("film_id", "document"))
+    drifted = [film_id for film_id, document in expected.items() if stored.get(film_id) != document]
+    if fix and drifted:
+        build_documents(drifted)
+    return {"checked": len(expected), "drifted": len(drifted)}
+
+
+def embedded_lookups(serializer, prefix=""):
+    # model -> the lookups from the model of the serializer to every row of that model it embeds
+    lookups = defaultdict(list)
+    for field in serializer.fields.values():
+        nested = nested_serializer(field)
+        if nested is None:
+            continue
+        path = f"{prefix}{field.source}"
+        lookups[nested.Meta.model].append(path)
+        for model, paths in embedded_lookups(nested, f"{path}__").items():
+            lookups[model] += paths
+    return lookups
+
+
+@cache
+def get_embedded_lookups():
+    return embedded_lookups(FilmReadOnlySerializer())
+
+
+def films_embedding(model, pks):
+    # the films whose documents embed one of the rows, found with one query
+    pks = list(pks)
+    if model is Film or not pks:
+        return set(pks)
+    queries = [
+        Film.objects.filter(**{f"{lookup}__in": pks}).order_by().values_list("pk", flat=True)
+        for lookup in get_embedded_lookups()[model]
+    ]
+    if not queries:
+        return set()
+    return set(queries[0].union(*queries[1:]))
+
+
+def schedule_rebuild(film_ids=None):
+    # None rebuilds every film, the callbacks of one transaction rebuild once
+    if film_ids is None:
+        pending.all = True
+    else:
+        pending.films = getattr(pending, "films", set()) | set(film_ids)
+    transaction.on_commit(flush_rebuild)
+
+
+def flush_rebuild():
+    rebuild_all = getattr(pending, "all", False)
+    film_ids = getattr(pending, "films", set())
+    pending.all, pending.films = False, set()
+    if rebuild_all:
+        build_documents()
+    elif film_ids:
+        build_documents(film_ids)
+
+
+class FilmDocumentMixin:
+    # serves the default representation of films from their documents
+    def render_rows(self, compiled, rows):
+        expansion = self.get_expansion()
+        if expansion["fields"] is not None or expansion["expand"] is not None:
+            return super().render_rows(compiled, rows)
+
+        documents = get_documents([row["id"] for row in rows])
+        return [json.loads(documents[row["id"]]) for row in rows]
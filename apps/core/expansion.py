@@ -0,0 +1,196 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def parse_fields(value):
+    # ?fields=title,episode_id -> {"title", "episode_id"}
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def parse_expand(value):
+    # ?expand=starships.pilots,characters -> {"starships": {"pilots": {}}, "characters": {}}
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split("."))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def nested_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    return field if isinstance(field, serializers.BaseSerializer) else None
+
+
+class ExpandableSerializerMixin:
+    # fields: names of the top level fields to return, None for all of them
+    # expand: tree of the relations to embed, the others come back as ids,
+    #         None to embed every nested serializer as declared
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.only_fields = fields
+        self.expand = expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        if self.only_fields is not None:
+            unknown = self.only_fields - set(fields)
+            if unknown:
+                raise ValidationError({"fields": [f"Unknown field '{name}'." for name in sorted(unknown)]})
+            fields = type(fields)((name, field) for name, field in fields.items() if name in self.only_fields)
+
+        if self.expand is not None:
+            expandable = {name for name, field in fields.items() if nested_serializer(field) is not None}
+            unknown = set(self.expand) - expandable
+            if unknown:
+                raise ValidationError({"expand": [f"Unknown relation '{name}'." for name in sorted(unknown)]})
+
+            for name in expandable:
+                field = fields[name]
+                many = isinstance(field, serializers.ListSerializer)
+                if name not in self.expand:
+                    fields[name] = serializers.PrimaryKeyRelatedField(many=many, read_only=True)
+                elif issubclass(type(nested_serializer(field)), ExpandableSerializerMixin):
+                    fields[name] = type(nested_serializer(field))(many=many, read_only=True, expand=self.expand[name])
+        return fields
+
+
+def related_lookups(serializer, model):
+    # select_related and Prefetch lookups that load exactly the relations the
+    # serializer renders, embedded ones with their own relations and the others as ids
+    select = []
+    prefetch = []
+    for name, field in serializer.fields.items():
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        nested = nested_serializer(field)
+        related_model = model_field.related_model
+        if model_field.many_to_many:
+            queryset = related_model.objects.all()
+            if nested is None:
+                queryset = queryset.only("pk")
+            else:
+                nested_select, nested_prefetch = related_lookups(nested, related_model)
+                queryset = queryset.select_related(*nested_select).prefetch_related(*nested_prefetch)
+            prefetch.append(Prefetch(name, queryset=queryset))
+        elif nested is not None:
+            nested_select, nested_prefetch = related_lookups(nested, related_model)
+            select.append(name)
+            select += [f"{name}__{lookup}" for lookup in nested_select]
+            prefetch += [
+                Prefetch(f"{name}__{lookup.prefetch_through}", queryset=lookup.queryset)
+                for lookup in nested_prefetch
+            ]
+    return select, prefetch
+
+
+def related_objects(field, instance):
+    value = getattr(instance, field.source)
+    if isinstance(field, serializers.ListSerializer):
+        return list(value.all())
+    return [] if value is None else [value]
+
+
+def collect_included(serializer, instances, included, flat_serializers, seen):
+    # walks the expanded relations and serializes every related object once,
+    # flat, into included[model_name][id]
+    for field in serializer.fields.values():
+        nested = nested_serializer(field)
+        if nested is None:
+            continue
+
+        model = nested.Meta.model
+        bucket = included.setdefault(model._meta.model_name, {})
+        flat = flat_serializers.setdefault(type(nested), type(nested)(expand={}))
+        pending = []
+        for instance in instances:
+            for obj in related_objects(field, instance):
+                key = str(obj.pk)
+                if key not in bucket:
+                    bucket[key] = flat.to_representation(obj)
+                if (id(nested), key) not in seen:
+                    seen.add((id(nested), key))
+                    pending.append(obj)
+        if pending:
+            collect_included(nested, pending, included, flat_serializers, seen)
+
+
+def normalize(serializer, flat, instances):
+    # serializer: the expanded serializer that decides what is included
+    # flat: the same fields with every relation as ids
+    included = {}
+    collect_included(serializer, instances, included, {}, set())
+    return [flat.to_representation(instance) for instance in instances], included
+
+
+class ExpandableViewSetMixin:
+    # ?fields= and ?expand= for list and retrieve, with the queryset built from
+    # the relations that will actually be rendered, and ?normalized=true to
+    # return the expanded objects once in "included" instead of nested
+    read_actions = ["list", "retrieve"]
+
+    def is_normalized(self):
+        return self.request.query_params.get("normalized", "").lower() in ("1", "true")
+
+    def get_expansion(self):
+        return {
+            "fields": parse_fields(self.request.query_params.get("fields")),
+            "expand": parse_expand(self.request.query_params.get("expand")),
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.read_actions:
+            kwargs = {**self.get_expansion(), **kwargs}
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.read_actions:
+            return queryset
+
+        serializer = self.get_serializer_class()(**self.get_expansion())
+        select, prefetch = related_lookups(serializer, queryset.model)
+        return queryset.select_related(*select).prefetch_related(*prefetch)
+
+    def normalize(self, instances):
+        expansion = self.get_expansion()
+        serializer_class = self.get_serializer_class()
+        return normalize(
+            serializer_class(**expansion),
+            serializer_class(fields=expansion["fields"], expand={}),
+            instances,
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_normalized():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        results, included = self.normalize(page if page is not None else list(queryset))
+        if page is None:
+            return Response({"results": results, "included": included})
+        response = self.get_paginated_response(results)
+        response.data["included"] = included
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.is_normalized():
+            return super().retrieve(request, *args, **kwargs)
+
+        [data], included = self.normalize([self.get_object()])
+        return Response({"data": data, "included": included})
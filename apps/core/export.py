@@ -0,0 +1,31 @@
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.utils.encoders import JSONEncoder
+
+from .expansion import ExpandableViewSetMixin
+
+
+class ExportViewSetMixin:
+    # GET <resource>/export/ streams every row matching the filters as NDJSON,
+    # relations as ids unless ?expand= asks for more
+    export_chunk_size = 500
+
+    read_actions = ExpandableViewSetMixin.read_actions + ["export"]
+
+    def get_expansion(self):
+        expansion = super().get_expansion()
+        if self.action == "export" and expansion["expand"] is None:
+            expansion["expand"] = {}
+        return expansion
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+
+        def rows():
+            for instance in queryset.iterator(chunk_size=self.export_chunk_size):
+                yield json.dumps(serializer.to_representation(instance), cls=JSONEncoder) + "\n"
+
+        return StreamingHttpResponse(rows(), content_type="application/x-ndjson")
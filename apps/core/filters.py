@@ -0,0 +1,90 @@
+import django_filters
+from django.db.models import F
+from django.template import loader
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .models import *
+from .search import SEARCH_FIELDS, rank, search_tokens
+
+
+NUMERIC_LOOKUPS = ["gt", "gte", "lt", "lte"]
+
+
+class NumericFilterSet(django_filters.FilterSet):
+    # range filters on the numeric shadow columns under the name of the text field,
+    # e.g. ?population__gte=1000000 or ?mass__isnull=true for the unknown ones
+    @classmethod
+    def get_filters(cls):
+        filters = super().get_filters()
+        if cls._meta.model is None:
+            return filters
+        for name in cls._meta.model.numeric_fields:
+            for lookup in NUMERIC_LOOKUPS:
+                filters[f"{name}__{lookup}"] = django_filters.NumberFilter(
+                    field_name=f"{name}_value", lookup_expr=lookup
+                )
+            filters[f"{name}__isnull"] = django_filters.BooleanFilter(field_name=f"{name}_value", lookup_expr="isnull")
+        return filters
+
+
+class PlanetFilterSet(NumericFilterSet):
+    class Meta:
+        model = Planet
+        fields = []
+
+
+class CharacterFilterSet(NumericFilterSet):
+    class Meta:
+        model = Character
+        fields = []
+
+
+class VehicleFilterSet(NumericFilterSet):
+    class Meta:
+        model = Vehicle
+        fields = []
+
+
+class StarshipFilterSet(NumericFilterSet):
+    class Meta:
+        model = Starship
+        fields = []
+
+
+class NumericOrderingFilter(OrderingFilter):
+    # orders numeric text fields by their shadow column, unknown values last
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        numeric_fields = getattr(queryset.model, "numeric_fields", [])
+        if not ordering:
+            return ordering
+        return [self.numeric_term(term, numeric_fields) for term in ordering]
+
+    def numeric_term(self, term, numeric_fields):
+        if not isinstance(term, str) or term.lstrip("-") not in numeric_fields:
+            return term
+        shadow = F(f"{term.lstrip('-')}_value")
+        return shadow.desc(nulls_last=True) if term.startswith("-") else shadow.asc(nulls_last=True)
+
+
+class IndexedSearchFilter(SearchFilter):
+    # ?search= answered from the search index instead of icontains scans, the
+    # best matches first unless ?ordering= asks for another order
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not query.strip():
+            return queryset
+        if not search_tokens(query):
+            return queryset.none()
+
+        # every match, ranked by the database
+        queryset = rank(queryset, query)
+        if request.query_params.get(OrderingFilter.ordering_param):
+            return queryset
+        title, _ = SEARCH_FIELDS[queryset.model._meta.model_name]
+        return queryset.order_by("-search_rank", title)
+
+    def to_html(self, request, queryset, view):
+        # the indexed fields are not listed on the view
+        template = loader.get_template(self.template)
+        return template.render(self.get_template_context(request, queryset, view))
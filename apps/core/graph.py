@@ -0,0 +1,133 @@
+import threading
+from array import array
+from collections import defaultdict
+
+from .cache import get_dataset_version
+from .models import *
+from .search import SEARCH_FIELDS
+
+
+MODELS = [Planet, Species, Character, Vehicle, Starship, Film]
+KINDS = [model._meta.model_name for model in MODELS]
+
+_graph = None
+_lock = threading.Lock()
+
+
+def edges():
+    # every link between two core objects: the many to many through tables and
+    # the planet foreign keys
+    for model in MODELS:
+        for field in model._meta.many_to_many:
+            yield from field.remote_field.through.objects.values_list(
+                field.m2m_field_name(), field.m2m_reverse_field_name()
+            )
+        for field in model._meta.concrete_fields:
+            if field.many_to_one and field.related_model in MODELS:
+                yield from model.objects.filter(**{f"{field.name}__isnull": False}).values_list("pk", field.attname)
+
+
+class Graph:
+    # every core object is a node numbered from 0, and the neighbours of node i
+    # are targets[offsets[i]:offsets[i + 1]] (compressed sparse rows)
+    __slots__ = ("version", "kinds", "ids", "titles", "index", "offsets", "targets")
+
+    def __init__(self, version):
+        self.version = version
+        self.kinds = array("b")
+        self.ids = []
+        self.titles = []
+        for kind_index, model in enumerate(MODELS):
+            for pk, title in model.objects.order_by().values_list("pk", SEARCH_FIELDS[KINDS[kind_index]][0]):
+                self.kinds.append(kind_index)
+                self.ids.append(pk)
+                self.titles.append(title)
+        self.index = {pk: node for node, pk in enumerate(self.ids)}
+
+        sources, targets = array("l"), array("l")
+        for source, target in edges():
+            # a link to a row written after the nodes were loaded is left out,
+            # the write changes the version and the graph is built again
+            source, target = self.index.get(source), self.index.get(target)
+            if source is not None and target is not None:
+                sources.append(source)
+                targets.append(target)
+
+        degrees = array("l", [0]) * (len(self.ids) + 1)
+        for node in sources:
+            degrees[node + 1] += 1
+        for node in targets:
+            degrees[node + 1] += 1
+        for node in range(len(self.ids)):
+            degrees[node + 1] += degrees[node]
+        self.offsets = degrees
+
+        position = array("l", self.offsets)
+        self.targets = array("l", [0]) * (2 * len(sources))
+        for source, target in zip(sources, targets):
+            self.targets[position[source]] = target
+            position[source] += 1
+            self.targets[position[target]] = source
+            position[target] += 1
+
+    def node(self, pk):
+        return self.index.get(pk)
+
+    def kind(self, node):
+        return KINDS[self.kinds[node]]
+
+    def neighbours(self, node, kinds=None):
+        neighbours = self.targets[self.offsets[node]:self.offsets[node + 1]]
+        if kinds is None:
+            return list(neighbours)
+        allowed = {KINDS.index(kind) for kind in kinds}
+        return [other for other in neighbours if self.kinds[other] in allowed]
+
+    def co_appearances(self, node, via="film"):
+        # (node, shared count) of the nodes of the same kind linked to a common
+        # node of the `via` kind, the most shared first
+        via, kind = KINDS.index(via), self.kinds[node]
+        shared = defaultdict(int)
+        for middle in self.neighbours(node):
+            if self.kinds[middle] == via:
+                for other in self.neighbours(middle):
+                    if other != node and self.kinds[other] == kind:
+                        shared[other] += 1
+        return sorted(shared.items(), key=lambda item: (-item[1], self.titles[item[0]]))
+
+    def shortest_path(self, source, target, via=None):
+        # breadth first, only through nodes of the `via` kinds when given
+        allowed = None if via is None else {KINDS.index(kind) for kind in via}
+        parents = array("l", [-1]) * len(self.ids)
+        parents[source] = source
+        frontier = [source]
+        while frontier and parents[target] == -1:
+            next_frontier = []
+            for node in frontier:
+                for other in self.neighbours(node):
+                    if parents[other] != -1:
+                        continue
+                    if other == target or allowed is None or self.kinds[other] in allowed:
+                        parents[other] = node
+                        next_frontier.append(other)
+            frontier = next_frontier
+        if parents[target] == -1:
+            return None
+
+        path = [target]
+        while path[-1] != source:
+            path.append(parents[path[-1]])
+        return path[::-1]
+
+
+def get_graph():
+    # built on first use and again after any write to the core models
+    global _graph
+    version = get_dataset_version()
+    graph = _graph
+    if graph is None or graph.version != version:
+        with _lock:
+            graph = _graph
+            if graph is None or graph.version != version:
+                graph = _graph = Graph(version)
+    return graph
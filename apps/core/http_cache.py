@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from django.conf import settings
+
+
+class ResponseCache:
+    # keeps the last body of every upstream url on disk together with its
+    # validators, so that repeated syncs can send conditional requests
+    def __init__(self, directory, ttl):
+        self.directory = Path(directory)
+        self.ttl = ttl
+
+    def path(self, url, suffix):
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}.{suffix}"
+
+    def get(self, url):
+        try:
+            with open(self.path(url, "json"), encoding="utf-8") as meta:
+                return json.load(meta)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read_body(self, entry):
+        with open(self.path(entry["url"], "body"), "rb") as body:
+            return body.read()
+
+    def store(self, entry, body=None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if body is not None:
+            self.write(self.path(entry["url"], "body"), body)
+        self.write(self.path(entry["url"], "json"), json.dumps(entry).encode())
+
+    def write(self, path, content):
+        # write then rename, so a crashed sync never leaves a half written file behind
+        temporary = path.with_suffix(path.suffix + ".tmp")
+        with open(temporary, "wb") as file:
+            file.write(content)
+        os.replace(temporary, path)
+
+
+class CachedResource:
+    # an upstream collection that has not changed since it was last loaded into the database
+    def __init__(self, cache, entry):
+        self.cache = cache
+        self.entry = entry
+
+    @property
+    def index(self):
+        return self.entry["index"]
+
+    def load(self):
+        return json.loads(self.cache.read_body(self.entry))
+
+
+def get_response_cache():
+    if not settings.SWAPI_CACHE_DIR:
+        return None
+    return ResponseCache(settings.SWAPI_CACHE_DIR, settings.SWAPI_CACHE_TTL)
+
+
+def body_hash(body):
+    return hashlib.sha256(body).hexdigest()
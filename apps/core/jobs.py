@@ -0,0 +1,151 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import SyncJob, SyncLock
+from .sync_data import SYNC_PHASES, sync
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "core:sync-jobs"
+
+_local_executor = None
+
+
+def phases_cache_key(job_id):
+    return f"core:sync-job:{job_id}:phases"
+
+
+def get_broker():
+    import redis
+
+    return redis.Redis.from_url(settings.SYNC_JOBS_BROKER_URL)
+
+
+def request_sync():
+    # single-flight: while a job is queued or running, every request attaches
+    # to it instead of starting a second sync over the same rows
+    with transaction.atomic():
+        SyncLock.objects.select_for_update().get_or_create(name="sync")
+
+        job = SyncJob.objects.filter(status__in=[SyncJob.QUEUED, SyncJob.RUNNING]).order_by("created_at").first()
+        if job is not None and not expire_stale(job):
+            return job, False
+
+        job = SyncJob.objects.create(phases={phase: "pending" for phase in SYNC_PHASES})
+        transaction.on_commit(lambda: dispatch(job.pk))
+        return job, True
+
+
+def expire_stale(job):
+    # a job that never finished (e.g. its worker was killed) must not hold the lock
+    # forever, a running job is timed from when it started rather than queued
+    since = job.started_at if job.status == SyncJob.RUNNING and job.started_at else job.created_at
+    if since > timezone.now() - timedelta(seconds=settings.SYNC_JOBS_STALE_AFTER):
+        return False
+
+    job.status = SyncJob.FAILED
+    job.error = "Sync job did not finish in time."
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+    return True
+
+
+def dispatch(job_id):
+    global _local_executor
+    try:
+        if settings.SYNC_JOBS_EAGER:
+            run_job(job_id)
+        elif settings.SYNC_JOBS_BROKER_URL:
+            get_broker().rpush(QUEUE_KEY, str(job_id))
+        else:
+            # no broker configured, run the job on a background thread of this process
+            if _local_executor is None:
+                _local_executor = ThreadPoolExecutor(max_workers=1)
+            _local_executor.submit(run_local_job, job_id)
+    except Exception as e:
+        # a job that cannot be queued would otherwise hold the lock until it expires
+        logger.exception("Could not dispatch sync job %s", job_id)
+        fail_job(job_id, f"Sync job could not be queued: {e}")
+
+
+def fail_job(job_id, error):
+    # for errors raised outside of sync(), which run_job records itself
+    now = timezone.now()
+    try:
+        SyncJob.objects.filter(pk=job_id, status__in=[SyncJob.QUEUED, SyncJob.RUNNING]).update(
+            status=SyncJob.FAILED, error=error, finished_at=now, updated_at=now
+        )
+        cache.delete(phases_cache_key(job_id))
+    except Exception:
+        logger.exception("Could not record the failure of sync job %s", job_id)
+
+
+def run_local_job(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def get_phases(job):
+    if job.status == SyncJob.RUNNING:
+        return cache.get(phases_cache_key(job.pk), job.phases)
+    return job.phases
+
+
+def run_job(job_id):
+    # claiming the job with a conditional update makes sure only one worker runs it
+    started_at = timezone.now()
+    claimed = SyncJob.objects.filter(pk=job_id, status=SyncJob.QUEUED).update(
+        status=SyncJob.RUNNING, started_at=started_at, updated_at=started_at
+    )
+    job = SyncJob.objects.get(pk=job_id)
+    if not claimed:
+        return job
+
+    # the writes run inside one transaction, so live progress goes through the
+    # cache where the status endpoint can see it before the job commits
+    phases = dict(job.phases)
+
+    def progress(phase, state):
+        phases[phase] = state
+        cache.set(phases_cache_key(job.pk), phases, timeout=settings.SYNC_JOBS_PROGRESS_TIMEOUT)
+
+    try:
+        job.report = sync(progress)
+        job.status = SyncJob.SUCCEEDED
+    except Exception as e:
+        job.error = str(getattr(e, "detail", e))
+        job.status = SyncJob.FAILED
+        for phase, state in phases.items():
+            if state == "running":
+                phases[phase] = "failed"
+
+    job.phases = phases
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "phases", "report", "error", "finished_at", "updated_at"])
+    cache.delete(phases_cache_key(job.pk))
+    return job
+
+
+def work(timeout=5):
+    broker = get_broker()
+    while True:
+        close_old_connections()
+        entry = broker.blpop(QUEUE_KEY, timeout=timeout)
+        if entry is None:
+            continue
+        _, job_id = entry
+        job_id = job_id.decode()
+        try:
+            run_job(job_id)
+        except Exception as e:
+            # one broken job must not stop the worker
+            logger.exception("Sync job %s failed", job_id)
+            fail_job(job_id, str(e))
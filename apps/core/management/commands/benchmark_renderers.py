@@ -0,0 +1,29 @@
+import json
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from apps.core.benchmark import run_renderer_benchmark
+
+
+class Command(BaseCommand):
+    help = "Times the stdlib and the fast JSON renderer on the full film list payload, on a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1, help="Multiple of the real catalog size.")
+        parser.add_argument("--repeat", type=int, default=5, help="Renders per renderer, the best one is kept.")
+        parser.add_argument("--json", action="store_true", help="Print the raw results as JSON.")
+
+    def handle(self, *args, **kwargs):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_renderer_benchmark(kwargs["scale"], kwargs["repeat"])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if kwargs["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for renderer, result in results["renderers"].items():
+            self.stdout.write(f"{renderer:<18} {result['seconds']:.4f}s {result['bytes']:>10} bytes")
+        self.stdout.write(f"identical output: {results['identical']}")
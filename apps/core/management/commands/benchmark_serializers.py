@@ -0,0 +1,37 @@
+import json
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from apps.core.benchmark import run_serializer_benchmark
+
+
+class Command(BaseCommand):
+    help = "Times the DRF read serializers against the compiled ones on generated data, on a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1, help="Multiple of the real catalog size.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per serializer, the best one is kept.")
+        parser.add_argument("--json", action="store_true", help="Print the raw results as JSON.")
+
+    def handle(self, *args, **kwargs):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_serializer_benchmark(kwargs["scale"], kwargs["repeat"])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if kwargs["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'resource':<10} {'drf':>16} {'compiled':>16} {'speedup':>8} {'bytes':>10} identical")
+        for resource, result in results.items():
+            drf, compiled = result["drf"], result["compiled"]
+            self.stdout.write(
+                f"{resource:<10} {self.cell(drf):>16} {self.cell(compiled):>16} "
+                f"{drf['seconds'] / compiled['seconds']:>7.1f}x {drf['bytes']:>10} {result['identical']}"
+            )
+        self.stdout.write("cells are seconds/queries")
+
+    def cell(self, result):
+        return f"{result['seconds']:.3f}s/{result['queries']}q"
@@ -0,0 +1,43 @@
+import json
+import tempfile
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from apps.core.benchmark import run_benchmark
+from apps.core.sync_data import SYNC_PHASES
+
+
+class Command(BaseCommand):
+    help = "Times sync() end to end and per phase against a synthetic SWAPI stand-in server, on a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, nargs="+", default=[1, 10], help="Multiples of the real catalog size.")
+        parser.add_argument("--response-cache", action="store_true", help="Enable the on-disk SWAPI response cache.")
+        parser.add_argument("--json", action="store_true", help="Print the raw results as JSON.")
+
+    def handle(self, *args, **kwargs):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = {}
+            for scale in kwargs["scale"]:
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    results[str(scale)] = run_benchmark(scale, cache_dir if kwargs["response_cache"] else None)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if kwargs["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        header = f"{'scale':>7} {'scenario':<8} {'total':>14}" + "".join(f" {phase:>16}" for phase in SYNC_PHASES)
+        self.stdout.write(header)
+        for scale, scenarios in results.items():
+            for scenario, result in scenarios.items():
+                row = f"{scale:>7} {scenario:<8} {self.cell(result):>14}"
+                for phase in SYNC_PHASES:
+                    row += f" {self.cell(result['phases'][phase]):>16}"
+                self.stdout.write(row)
+        self.stdout.write("cells are seconds/queries")
+
+    def cell(self, result):
+        return f"{result['seconds']:.3f}s/{result['queries']}q"
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.documents import check_documents
+
+
+class Command(BaseCommand):
+    help = "Compares the stored film documents with freshly rendered ones and rebuilds the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the drifted documents.")
+
+    def handle(self, *args, **kwargs):
+        result = check_documents(fix=not kwargs["dry_run"])
+        action = "drifted" if kwargs["dry_run"] else "rebuilt"
+        self.stdout.write(f"Checked {result['checked']} film documents, {result['drifted']} {action}.")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.snapshot import export_snapshot
+
+
+class Command(BaseCommand):
+    help = "Exports the Star Wars data and its links to an NDJSON snapshot (gzipped when the path ends with .gz)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+
+    def handle(self, *args, **kwargs):
+        counts = export_snapshot(kwargs["path"])
+        for resource, count in counts.items():
+            self.stdout.write(f"{resource}: {count} exported")
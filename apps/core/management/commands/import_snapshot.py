@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.snapshot import import_snapshot
+
+
+class Command(BaseCommand):
+    help = "Loads an NDJSON snapshot created by export_snapshot through the bulk sync path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+
+    def handle(self, *args, **kwargs):
+        report = import_snapshot(kwargs["path"])
+        for resource, stats in report.items():
+            self.stdout.write(
+                f"{resource}: {stats['created']} created, {stats['updated']} updated, "
+                f"{stats['unchanged']} unchanged, {stats['removed']} removed"
+            )
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Runs the queued sync jobs pushed to the Redis broker."
+
+    def handle(self, *args, **kwargs):
+        if not settings.SYNC_JOBS_BROKER_URL:
+            raise CommandError("SYNC_JOBS_BROKER_URL is not set, sync jobs run inside the web process.")
+
+        self.stdout.write("Waiting for sync jobs...")
+        work()
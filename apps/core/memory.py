@@ -0,0 +1,255 @@
+import logging
+import threading
+import uuid
+from array import array
+from operator import attrgetter
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import Http404
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+
+from .cache import get_dataset_version
+from .compiled import ForeignKeyRelation
+from .graph import MODELS
+from .search import SEARCH_FIELDS, search_tokens
+
+
+logger = logging.getLogger(__name__)
+
+_snapshot = None
+_lock = threading.Lock()
+
+NUMERIC_LOOKUPS = {
+    "gt": lambda value, bound: value > bound,
+    "gte": lambda value, bound: value >= bound,
+    "lt": lambda value, bound: value < bound,
+    "lte": lambda value, bound: value <= bound,
+}
+
+
+class Record:
+    # one row, with the columns of its model as slots and its position in the table
+    __slots__ = ("position",)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def record_class(model):
+    columns = [field.attname for field in model._meta.concrete_fields]
+    pk = property(attrgetter(model._meta.pk.attname))
+    return type(f"{model.__name__}Record", (Record,), {"__slots__": columns, "pk": pk})
+
+
+class Table:
+    # the rows of a model in its default order, pk -> position in `index`, and the
+    # words of the searchable text of every row
+    __slots__ = ("model", "records", "index", "words")
+
+    def __init__(self, model):
+        self.model = model
+        cls = record_class(model)
+        columns = cls.__slots__
+        self.records = []
+        for position, values in enumerate(model.objects.values_list(*columns)):
+            record = cls()
+            record.position = position
+            for column, value in zip(columns, values):
+                setattr(record, column, value)
+            self.records.append(record)
+        self.index = {record.pk: record.position for record in self.records}
+
+        title, fields = SEARCH_FIELDS[model._meta.model_name]
+        self.words = [
+            (search_tokens(getattr(record, title)), search_tokens(" ".join(getattr(record, name) for name in fields)))
+            for record in self.records
+        ]
+
+    def get(self, pk):
+        position = self.index.get(pk)
+        return None if position is None else self.records[position]
+
+
+class Snapshot:
+    # every row of the core models and the many to many links between them, the
+    # targets of each source as positions in the target table, in its default order
+    __slots__ = ("version", "tables", "links")
+
+    def __init__(self, version):
+        self.version = version
+        self.tables = {model: Table(model) for model in MODELS}
+        self.links = {}
+        for model in MODELS:
+            source = self.tables[model]
+            for field in model._meta.many_to_many:
+                target = self.tables[field.related_model]
+                links = [array("l") for _ in source.records]
+                pairs = field.remote_field.through.objects.values_list(
+                    field.m2m_field_name(), field.m2m_reverse_field_name()
+                )
+                for source_pk, target_pk in pairs:
+                    # a link to a row written after the tables were loaded is
+                    # left out, the write changes the version and the snapshot
+                    # is loaded again
+                    source_position = source.index.get(source_pk)
+                    target_position = target.index.get(target_pk)
+                    if source_position is not None and target_position is not None:
+                        links[source_position].append(target_position)
+                self.links[(field.related_model, field.related_query_name())] = [
+                    array("l", sorted(targets)) for targets in links
+                ]
+
+    def render(self, compiled, records):
+        # same output as CompiledSerializer.render() from the rows of the database
+        loaded = [self.load(relation, records) for relation in compiled.relations]
+        getters = compiled.getters
+        return [{name: getter(record, loaded) for name, getter in getters} for record in records]
+
+    def load(self, relation, records):
+        if isinstance(relation, ForeignKeyRelation):
+            table = self.tables[relation.child.model]
+            related = [table.get(pk) for pk in {record[relation.attname] for record in records} - {None}]
+            related = [record for record in related if record is not None]
+            return dict(zip((record.pk for record in related), self.render(relation.child, related)))
+
+        table = self.tables[relation.related_model]
+        links = self.links[(relation.related_model, relation.query_name)]
+        if relation.child is None:
+            return {record.pk: [table.records[target].pk for target in links[record.position]] for record in records}
+        distinct = sorted({target for record in records for target in links[record.position]})
+        rendered = dict(zip(distinct, self.render(relation.child, [table.records[target] for target in distinct])))
+        return {record.pk: [rendered[target] for target in links[record.position]] for record in records}
+
+    def search(self, model, query):
+        # every word of the query as a prefix of a word, the rows found by
+        # their name first
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        table = self.tables[model]
+        by_title, by_text = [], []
+        for record, (title, body) in zip(table.records, table.words):
+            if all(any(word.startswith(token) for word in title) for token in tokens):
+                by_title.append(record)
+            elif all(any(word.startswith(token) for word in title + body) for token in tokens):
+                by_text.append(record)
+        return by_title + by_text
+
+
+def get_snapshot():
+    # swapped for a new one after any write to the core models
+    global _snapshot
+    version = get_dataset_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = _snapshot = Snapshot(version)
+    return snapshot
+
+
+def warm_snapshot():
+    # loads the snapshot when the worker starts rather than on its first request
+    if not settings.CORE_MEMORY_READS:
+        return
+    try:
+        get_snapshot()
+    except DatabaseError:
+        logger.exception("Could not load the in-memory snapshot, it will be loaded on first use")
+
+
+class MemoryReadMixin:
+    # with CORE_MEMORY_READS, answers list and retrieve from the snapshot without
+    # querying the database, for the requests it can answer: page pagination,
+    # the numeric filters, ?search= and ordering by columns. Goes between
+    # CachedResponseMixin and ConditionalResponseMixin and computes the same
+    # validators as the latter.
+    def use_memory_reads(self):
+        return settings.CORE_MEMORY_READS and self.use_compiled_reads()
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_memory_reads() or self.paginator.get_mode(request, self) != "page":
+            return super().list(request, *args, **kwargs)
+        compiled = self.get_compiled_serializer()
+        snapshot = get_snapshot()
+        records = self.memory_filter(snapshot, request)
+        if records is None:
+            return super().list(request, *args, **kwargs)
+
+        validators = {
+            "count": len(records),
+            "updated_at": max((record.updated_at for record in records), default=None),
+        }
+
+        def view(request, *args, **kwargs):
+            page = self.paginate_queryset(records)
+            if page is not None:
+                return self.get_paginated_response(snapshot.render(compiled, page))
+            return Response(snapshot.render(compiled, records))
+        return self.conditional_response(view, validators, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_memory_reads():
+            return super().retrieve(request, *args, **kwargs)
+        compiled = self.get_compiled_serializer()
+        snapshot = get_snapshot()
+        model = self.queryset.model
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            record = snapshot.tables[model].get(uuid.UUID(str(self.kwargs[lookup_url_kwarg])))
+        except ValueError:
+            record = None
+        if record is None:
+            raise Http404(f"No {model._meta.object_name} matches the given query.")
+        self.check_object_permissions(request, record)
+
+        def view(request, *args, **kwargs):
+            return Response(snapshot.render(compiled, [record])[0])
+        return self.conditional_response(view, {"updated_at": record.updated_at}, request, *args, **kwargs)
+
+    def memory_filter(self, snapshot, request):
+        # the records the filter backends would select, None when one of them
+        # is asked for something only the database can answer
+        model = self.queryset.model
+        records = snapshot.tables[model].records
+
+        filterset_class = getattr(self, "filterset_class", None)
+        if filterset_class is not None:
+            filterset = filterset_class(data=request.query_params, queryset=model.objects.none(), request=request)
+            if not filterset.is_valid():
+                return None
+            for name, value in filterset.form.cleaned_data.items():
+                if value is None:
+                    continue
+                column = filterset.filters[name].field_name
+                if name.endswith("__isnull"):
+                    records = [record for record in records if (record[column] is None) == value]
+                else:
+                    compare = NUMERIC_LOOKUPS[name.rsplit("__", 1)[1]]
+                    records = [
+                        record for record in records if record[column] is not None and compare(record[column], value)
+                    ]
+
+        query = request.query_params.get("search", "")
+        if query.strip():
+            selected = {record.position for record in records}
+            ranked = snapshot.search(model, query)
+            records = [record for record in ranked if record.position in selected]
+
+        ordering = OrderingFilter().get_ordering(request, self.queryset, self)
+        if request.query_params.get(OrderingFilter.ordering_param) and ordering:
+            columns = {field.attname for field in model._meta.concrete_fields}
+            for term in reversed(ordering):
+                name = term.lstrip("-")
+                if name in model.numeric_fields:
+                    name = f"{name}_value"
+                if name not in columns:
+                    return None
+                descending = term.startswith("-")
+                known = [record for record in records if record[name] is not None]
+                unknown = [record for record in records if record[name] is None]
+                known.sort(key=lambda record: record[name], reverse=descending)
+                records = known + unknown
+        return records
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_syncjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+    ]
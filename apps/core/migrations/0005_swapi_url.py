@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_synclock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='swapi_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='film',
+            name='swapi_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='swapi_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='species',
+            name='swapi_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='starship',
+            name='swapi_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='swapi_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+    ]
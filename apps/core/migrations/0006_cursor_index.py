@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_swapi_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['created_at', 'id'], name='core_character_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='film',
+            index=models.Index(fields=['created_at', 'id'], name='core_film_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planet',
+            index=models.Index(fields=['created_at', 'id'], name='core_planet_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='species',
+            index=models.Index(fields=['created_at', 'id'], name='core_species_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='starship',
+            index=models.Index(fields=['created_at', 'id'], name='core_starship_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['created_at', 'id'], name='core_vehicle_cursor_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_cursor_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmDocument',
+            fields=[
+                ('film', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='core.film')),
+                ('document', models.TextField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
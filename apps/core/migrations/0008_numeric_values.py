@@ -0,0 +1,102 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:22
+
+import re
+
+from django.db import migrations, models
+
+
+# frozen copy of apps.core.numbers.parse_number as of this migration
+UNKNOWN_VALUES = {"", "unknown", "n/a", "none", "indefinite"}
+UNITS = {"": 1, "m": 1, "km": 1000, "kg": 1, "t": 1000}
+NUMBER_RE = re.compile(r"^(-?\d+(?:\.\d+)?)\s*([a-z]*)$")
+
+
+def parse_number(value):
+    if value is None:
+        return None
+    value = str(value).strip().lower().replace(",", "")
+    if value in UNKNOWN_VALUES:
+        return None
+    match = NUMBER_RE.match(value)
+    if match is None or match.group(2) not in UNITS:
+        return None
+    return float(match.group(1)) * UNITS[match.group(2)]
+
+
+NUMERIC_FIELDS = {
+    "planet": ["diameter", "population"],
+    "character": ["height", "mass"],
+    "vehicle": ["cost_in_credits", "length", "cargo_capacity"],
+    "starship": ["cost_in_credits", "length", "cargo_capacity"],
+}
+
+
+def fill_numeric_values(apps, schema_editor):
+    for model_name, names in NUMERIC_FIELDS.items():
+        model = apps.get_model("core", model_name)
+        rows = list(model.objects.only("pk", *names))
+        for row in rows:
+            for name in names:
+                setattr(row, f"{name}_value", parse_number(getattr(row, name)))
+        model.objects.bulk_update(rows, [f"{name}_value" for name in names], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_filmdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='height_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='character',
+            name='mass_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='diameter_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='population_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='starship',
+            name='cargo_capacity_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='starship',
+            name='cost_in_credits_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='starship',
+            name='length_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='cargo_capacity_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='cost_in_credits_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='length_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_numeric_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+# frozen copies of apps.core.search as of this migration, later changes to the
+# search must not change what it does
+SEARCH_FIELDS = {
+    "planet": ("name", ["climate", "terrain"]),
+    "species": ("name", ["classification", "designation", "language"]),
+    "character": ("name", []),
+    "vehicle": ("name", ["model", "manufacturer", "vehicle_class"]),
+    "starship": ("name", ["model", "manufacturer", "starship_class"]),
+    "film": ("title", ["opening_crawl", "director", "producer"]),
+}
+
+VECTOR = "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B'))"
+
+
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE core_searchentry_fts USING fts5(
+        title, body, content='core_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER core_searchentry_fts_insert AFTER INSERT ON core_searchentry BEGIN
+        INSERT INTO core_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchentry_fts_delete AFTER DELETE ON core_searchentry BEGIN
+        INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchentry_fts_update AFTER UPDATE ON core_searchentry BEGIN
+        INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO core_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS core_searchentry_fts_insert",
+    "DROP TRIGGER IF EXISTS core_searchentry_fts_delete",
+    "DROP TRIGGER IF EXISTS core_searchentry_fts_update",
+    "DROP TABLE IF EXISTS core_searchentry_fts",
+]
+
+POSTGRES_INDEX = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX core_searchentry_vector_idx ON core_searchentry USING GIN ({VECTOR})",
+    "CREATE INDEX core_searchentry_title_trgm_idx ON core_searchentry USING GIN (title gin_trgm_ops)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS core_searchentry_vector_idx",
+    "DROP INDEX IF EXISTS core_searchentry_title_trgm_idx",
+]
+
+
+def run_for_vendor(statements):
+    # the full-text index depends on the database, others search the table itself
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def fill_index(apps, schema_editor):
+    entry_model = apps.get_model("core", "searchentry")
+    for kind, (title, fields) in SEARCH_FIELDS.items():
+        rows = apps.get_model("core", kind).objects.order_by().values_list("pk", title, *fields)
+        entry_model.objects.bulk_create(
+            [
+                entry_model(kind=kind, object_id=row[0], title=row[1], body="\n".join(value for value in row[2:] if value))
+                for row in rows
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_numeric_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='core_searchentry_object_uniq')],
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX}),
+            run_for_vendor({"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def drop_film_documents(apps, schema_editor):
+    # rendered with the swapi_url field, which is no longer exposed; the
+    # documents are built again when the films are first read
+    apps.get_model("core", "FilmDocument").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_searchentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_film_documents, migrations.RunPython.noop),
+    ]
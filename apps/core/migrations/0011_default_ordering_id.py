@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_drop_film_documents'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='character',
+            options={'ordering': ['-created_at', '-updated_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='film',
+            options={'ordering': ['-created_at', '-updated_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='planet',
+            options={'ordering': ['-created_at', '-updated_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='species',
+            options={'ordering': ['-created_at', '-updated_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='starship',
+            options={'ordering': ['-created_at', '-updated_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='syncjob',
+            options={'ordering': ['-created_at', '-updated_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='vehicle',
+            options={'ordering': ['-created_at', '-updated_at', '-id']},
+        ),
+    ]
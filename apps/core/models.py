@@ -1,8 +1,46 @@
 from django.db import models
 from api.models import BaseModel
 
+from .numbers import numeric_values
+
+
+def numeric_field():
+    # parsed copy of a numeric text field, NULL when unknown
+    return models.FloatField(null=True, blank=True, editable=False, db_index=True)
+
+
+class SwapiModel(BaseModel):
+    # text fields holding numbers, each with a <name>_value shadow column
+    numeric_fields = []
+
+    # upstream identity of synced rows, empty for rows created locally
+    swapi_url = models.CharField(max_length=255, unique=True, null=True, blank=True, editable=False)
+    # hash of the upstream record the row was last synced from
+    fingerprint = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    class Meta(BaseModel.Meta):
+        abstract = True
+        # keyset pagination seeks on (created_at, id)
+        indexes = [models.Index(fields=["created_at", "id"], name="%(app_label)s_%(class)s_cursor_idx")]
+
+    def save(self, *args, **kwargs):
+        values = {name: getattr(self, name) for name in self.numeric_fields}
+        for name, value in numeric_values(type(self), values).items():
+            setattr(self, name, value)
+        # the sync writes in bulk, a saved row no longer matches its upstream record
+        self.fingerprint = ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, "fingerprint",
+                *(f"{name}_value" for name in self.numeric_fields if name in update_fields),
+            }
+        super().save(*args, **kwargs)
+
+
+class Planet(SwapiModel):
+    numeric_fields = ["diameter", "population"]
 
-class Planet(BaseModel):
     name = models.CharField(max_length=255)
     rotation_period = models.CharField(max_length=50)
     orbital_period = models.CharField(max_length=50)
@@ -12,12 +50,14 @@ class Planet(BaseModel):
     terrain = models.CharField(max_length=255)
     surface_water = models.CharField(max_length=50)
     population = models.CharField(max_length=50)
+    diameter_value = numeric_field()
+    population_value = numeric_field()
 
     def __str__(self):
         return "Planet " + self.name
 
 
-class Species(BaseModel):
+class Species(SwapiModel):
     name = models.CharField(max_length=255)
     classification = models.CharField(max_length=100)
     designation = models.CharField(max_length=100)
@@ -33,7 +73,9 @@ class Species(BaseModel):
         return "Species " + self.name
 
 
-class Character(BaseModel):
+class Character(SwapiModel):
+    numeric_fields = ["height", "mass"]
+
     name = models.CharField(max_length=255)
     height = models.CharField(max_length=50)
     mass = models.CharField(max_length=50)
@@ -44,12 +86,16 @@ class Character(BaseModel):
     gender = models.CharField(max_length=50)
     planet = models.ForeignKey(Planet, on_delete=models.SET_NULL, null=True, blank=True, related_name="characters")
     species = models.ManyToManyField(Species, blank=True, related_name="characters")
+    height_value = numeric_field()
+    mass_value = numeric_field()
 
     def __str__(self):
         return self.name
 
 
-class Vehicle(BaseModel):
+class Vehicle(SwapiModel):
+    numeric_fields = ["cost_in_credits", "length", "cargo_capacity"]
+
     name = models.CharField(max_length=255)
     model = models.CharField(max_length=255)
     manufacturer = models.CharField(max_length=255)
@@ -62,12 +108,17 @@ class Vehicle(BaseModel):
     consumables = models.CharField(max_length=100)
     vehicle_class = models.CharField(max_length=100)
     pilots = models.ManyToManyField(Character, blank=True, related_name="vehicles")
+    cost_in_credits_value = numeric_field()
+    length_value = numeric_field()
+    cargo_capacity_value = numeric_field()
 
     def __str__(self):
         return self.name
 
 
-class Starship(BaseModel):
+class Starship(SwapiModel):
+    numeric_fields = ["cost_in_credits", "length", "cargo_capacity"]
+
     name = models.CharField(max_length=255)
     model = models.CharField(max_length=255)
     manufacturer = models.CharField(max_length=255)
@@ -82,12 +133,15 @@ class Starship(BaseModel):
     MGLT = models.CharField(max_length=50)
     starship_class = models.CharField(max_length=100)
     pilots = models.ManyToManyField(Character, blank=True, related_name="starships")
+    cost_in_credits_value = numeric_field()
+    length_value = numeric_field()
+    cargo_capacity_value = numeric_field()
 
     def __str__(self):
         return "Startship " + self.name
 
 
-class Film(BaseModel):
+class Film(SwapiModel):
     title = models.CharField(max_length=255)
     episode_id = models.IntegerField()
     opening_crawl = models.TextField()
@@ -102,3 +156,71 @@ class Film(BaseModel):
 
     def __str__(self):
         return self.title
+
+
+class SyncJob(BaseModel):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    phases = models.JSONField(default=dict, blank=True)
+    report = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Sync job {self.id} ({self.status})"
+
+
+class SyncLock(models.Model):
+    # one row per lock name, locked with SELECT ... FOR UPDATE so that every
+    # process queues sync jobs one at a time
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class DatasetVersion(models.Model):
+    # a single row counting the committed writes to the core models, which
+    # every process sees change, unlike a per-process cache
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Dataset version {self.version}"
+
+
+class FilmDocument(models.Model):
+    # the rendered read representation of a film, rebuilt at sync and when any
+    # of the data it embeds is written. Kept as text rather than a JSONField
+    # because jsonb does not preserve the order of the keys.
+    film = models.OneToOneField(Film, on_delete=models.CASCADE, primary_key=True, related_name="document")
+    document = models.TextField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Document of {self.film_id}"
+
+
+class SearchEntry(models.Model):
+    # the searchable text of every core object, the one table behind the
+    # full-text indexes of apps.core.search
+    kind = models.CharField(max_length=20)
+    object_id = models.UUIDField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["kind", "object_id"], name="core_searchentry_object_uniq")]
+
+    def __str__(self):
+        return f"{self.kind} {self.title}"
@@ -0,0 +1,31 @@
+import re
+
+
+# upstream placeholders for a missing value
+UNKNOWN_VALUES = {"", "unknown", "n/a", "none", "indefinite"}
+
+# unit suffixes and their factor to the unit of the column
+UNITS = {"": 1, "m": 1, "km": 1000, "kg": 1, "t": 1000}
+
+NUMBER_RE = re.compile(r"^(-?\d+(?:\.\d+)?)\s*([a-z]*)$")
+
+
+def parse_number(value):
+    # "1,358" -> 1358.0, "12 km" -> 12000.0, "unknown" -> None
+    if value is None:
+        return None
+    value = str(value).strip().lower().replace(",", "")
+    if value in UNKNOWN_VALUES:
+        return None
+    match = NUMBER_RE.match(value)
+    if match is None or match.group(2) not in UNITS:
+        return None
+    return float(match.group(1)) * UNITS[match.group(2)]
+
+
+def numeric_values(model, values):
+    # shadow column values for the numeric text fields present in values
+    return {
+        f"{name}_value": parse_number(values[name])
+        for name in model.numeric_fields if name in values
+    }
@@ -1,7 +1,133 @@
-from rest_framework.pagination import PageNumberPagination
+import uuid
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, Cursor, CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 10
+
+
+class KeysetResultsSetPagination(CursorPagination):
+    # seeks on (created_at, id) instead of counting and offsetting, so that every
+    # page costs the same, backed by the cursor index of the core models
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 10
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # the pages follow the seek order only, any other order would be dropped
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            raise ValidationError({api_settings.ORDERING_PARAM: ["Ordering is not supported with cursor pagination."]})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request) or Cursor(offset=0, reverse=False, position=None)
+        reverse = self.cursor.reverse
+
+        if self.cursor.position is not None:
+            created_at, pk = self.parse_position(self.cursor.position)
+            lookup = "gt" if reverse else "lt"
+            queryset = queryset.filter(
+                Q(**{f"created_at__{lookup}": created_at})
+                | Q(created_at=created_at, **{f"id__{lookup}": pk})
+            )
+
+        queryset = queryset.order_by(*(("created_at", "id") if reverse else self.ordering))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor.position is not None
+        self.display_page_controls = self.template is not None
+        return self.page
+
+    def parse_position(self, position):
+        created_at, _, pk = position.partition("|")
+        try:
+            created_at = parse_datetime(created_at)
+            pk = uuid.UUID(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            return f"{instance['created_at'].isoformat()}|{instance['id']}"
+        return f"{instance.created_at.isoformat()}|{instance.pk}"
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+
+class SelectableResultsSetPagination(BasePagination):
+    # page numbers or keyset cursors, picked per request with ?pagination=page|cursor
+    # (a ?cursor= implies keyset) and per viewset with `pagination_mode`
+    modes = {
+        "page": StandardResultsSetPagination,
+        "cursor": KeysetResultsSetPagination,
+    }
+
+    def __init__(self):
+        self.paginators = {mode: pagination_class() for mode, pagination_class in self.modes.items()}
+        self.active = self.paginators["page"]
+
+    def get_mode(self, request, view):
+        mode = request.query_params.get("pagination")
+        if mode is None:
+            if KeysetResultsSetPagination.cursor_query_param in request.query_params:
+                return "cursor"
+            return getattr(view, "pagination_mode", "page")
+        if mode not in self.modes:
+            raise ValidationError({"pagination": [f"Unknown pagination '{mode}'."]})
+        return mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.paginators[self.get_mode(request, view)]
+        return self.active.paginate_queryset(queryset, request, view)
+
+    @property
+    def display_page_controls(self):
+        return self.active.display_page_controls
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.active.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = {}
+        for paginator in self.paginators.values():
+            for parameter in paginator.get_schema_operation_parameters(view):
+                parameters.setdefault(parameter["name"], parameter)
+        parameters["pagination"] = {
+            "name": "pagination",
+            "required": False,
+            "in": "query",
+            "description": "Pagination mode, page numbers or keyset cursors.",
+            "schema": {"type": "string", "enum": list(self.modes)},
+        }
+        return list(parameters.values())
+
+    def to_html(self):
+        return self.active.to_html()
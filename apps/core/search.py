@@ -0,0 +1,228 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils.module_loading import import_string
+
+from .models import SearchEntry
+
+
+INDEX_BATCH_SIZE = 500
+
+# the field holding the name of the objects of each kind, ranked above the
+# other fields they can be found by
+SEARCH_FIELDS = {
+    "planet": ("name", ["climate", "terrain"]),
+    "species": ("name", ["classification", "designation", "language"]),
+    "character": ("name", []),
+    "vehicle": ("name", ["model", "manufacturer", "vehicle_class"]),
+    "starship": ("name", ["model", "manufacturer", "starship_class"]),
+    "film": ("title", ["opening_crawl", "director", "producer"]),
+}
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def search_tokens(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def index_objects(model, pks=None, entry_model=SearchEntry):
+    # upserts the entries of the given rows, or of every row of the model and
+    # drops the entries of the rows that are gone
+    kind = model._meta.model_name
+    title, fields = SEARCH_FIELDS[kind]
+    queryset = model.objects.order_by()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    entries = [
+        entry_model(kind=kind, object_id=row[0], title=row[1], body="\n".join(value for value in row[2:] if value))
+        for row in queryset.values_list("pk", title, *fields)
+    ]
+    entry_model.objects.bulk_create(
+        entries,
+        batch_size=INDEX_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["kind", "object_id"],
+        update_fields=["title", "body"],
+    )
+    if pks is None:
+        entry_model.objects.filter(kind=kind).exclude(object_id__in=model.objects.values("pk")).delete()
+
+
+def remove_objects(model, pks):
+    SearchEntry.objects.filter(kind=model._meta.model_name, object_id__in=pks).delete()
+
+
+class SearchBackend:
+    # search() returns the (kind, object_id, title, rank) of the entries matching
+    # every word of the query, each word as a prefix, best first and at most
+    # `limit` of every kind. rank() keeps every row of a queryset that matches
+    # and annotates it with its `search_rank`, computed in the database.
+    def search(self, query, kinds, limit):
+        raise NotImplementedError
+
+    def rank(self, queryset, query):
+        raise NotImplementedError
+
+    def raw_rank(self, queryset, matches, rank):
+        # matches selects the object_id of the matching entries once, rank is
+        # computed for each remaining row from the entry whose object_id is {pk}
+        model = queryset.model
+        quote = connection.ops.quote_name
+        pk = f"{quote(model._meta.db_table)}.{quote(model._meta.pk.column)}"
+        return queryset.filter(pk__in=RawSQL(*matches)).annotate(
+            search_rank=RawSQL(rank[0].replace("{pk}", pk), rank[1], output_field=FloatField())
+        )
+
+    def hits(self, sql, params):
+        to_python = SearchEntry._meta.get_field("object_id").to_python
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(kind, to_python(object_id), title, rank) for kind, object_id, title, rank in cursor.fetchall()]
+
+
+class DatabaseSearchBackend(SearchBackend):
+    # icontains on the entries, for databases without a full-text index
+    def search(self, query, kinds, limit):
+        matches = Q()
+        for token in search_tokens(query):
+            matches &= Q(title__icontains=token) | Q(body__icontains=token)
+        rank = Case(
+            When(title__iexact=query, then=Value(3.0)),
+            When(title__istartswith=query, then=Value(2.0)),
+            When(title__icontains=query, then=Value(1.0)),
+            default=Value(0.5),
+            output_field=FloatField(),
+        )
+        entries = SearchEntry.objects.filter(matches, kind__in=kinds).annotate(
+            rank=rank,
+            position=Window(RowNumber(), partition_by=F("kind"), order_by=[F("rank").desc(), F("title").asc()]),
+        )
+        entries = entries.filter(position__lte=limit).order_by("-rank", "title")
+        return list(entries.values_list("kind", "object_id", "title", "rank"))
+
+    def rank(self, queryset, query):
+        matches = Q()
+        for token in search_tokens(query):
+            matches &= Q(title__icontains=token) | Q(body__icontains=token)
+        entries = SearchEntry.objects.filter(matches, kind=queryset.model._meta.model_name)
+        rank = Case(
+            When(title__iexact=query, then=Value(3.0)),
+            When(title__istartswith=query, then=Value(2.0)),
+            When(title__icontains=query, then=Value(1.0)),
+            default=Value(0.5),
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=entries.values("object_id")).annotate(
+            search_rank=Subquery(entries.filter(object_id=OuterRef("pk")).annotate(rank=rank).values("rank")[:1])
+        )
+
+
+class SqliteSearchBackend(SearchBackend):
+    # bm25 over the FTS5 shadow table of the entries, kept in sync by triggers
+    sql = """
+        SELECT kind, object_id, title, rank FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY kind ORDER BY rank DESC, title) AS position FROM (
+                SELECT entry.kind, entry.object_id, entry.title,
+                    -bm25(core_searchentry_fts, 10.0, 1.0) AS rank
+                FROM core_searchentry_fts JOIN core_searchentry AS entry ON entry.id = core_searchentry_fts.rowid
+                WHERE core_searchentry_fts MATCH %s AND entry.kind IN ({kinds})
+            )
+        ) WHERE position <= %s ORDER BY rank DESC, title
+    """
+
+    matches_sql = """
+        SELECT entry.object_id
+        FROM core_searchentry_fts JOIN core_searchentry AS entry ON entry.id = core_searchentry_fts.rowid
+        WHERE core_searchentry_fts MATCH %s AND entry.kind = %s
+    """
+
+    rank_sql = """
+        SELECT -bm25(core_searchentry_fts, 10.0, 1.0)
+        FROM core_searchentry_fts JOIN core_searchentry AS entry ON entry.id = core_searchentry_fts.rowid
+        WHERE core_searchentry_fts MATCH %s AND entry.kind = %s AND entry.object_id = {pk}
+    """
+
+    def match(self, query):
+        return " ".join(f'"{token}"*' for token in search_tokens(query))
+
+    def search(self, query, kinds, limit):
+        sql = self.sql.format(kinds=", ".join(["%s"] * len(kinds)))
+        return self.hits(sql, [self.match(query), *kinds, limit])
+
+    def rank(self, queryset, query):
+        params = [self.match(query), queryset.model._meta.model_name]
+        return self.raw_rank(queryset, (self.matches_sql, params), (self.rank_sql, params))
+
+
+class PostgresSearchBackend(SearchBackend):
+    # ts_rank over a GIN-indexed tsvector of the entries plus the trigram
+    # similarity of the titles, which also finds words by their middle
+    sql = """
+        SELECT kind, object_id, title, rank FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY kind ORDER BY rank DESC, title) AS position FROM (
+                SELECT kind, object_id, title,
+                    ts_rank({vector}, query) + similarity(title, %s) AS rank
+                FROM core_searchentry, to_tsquery('simple', %s) AS query
+                WHERE kind IN ({kinds}) AND ({vector} @@ query OR title ILIKE %s)
+            ) AS matches
+        ) AS ranked WHERE position <= %s ORDER BY rank DESC, title
+    """
+
+    # same expression as the index of migration 0009, which keeps its own copy
+    vector = "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B'))"
+
+    matches_sql = """
+        SELECT object_id FROM core_searchentry, to_tsquery('simple', %s) AS query
+        WHERE kind = %s AND ({vector} @@ query OR title ILIKE %s)
+    """
+
+    rank_sql = """
+        SELECT ts_rank({vector}, query) + similarity(title, %s)
+        FROM core_searchentry, to_tsquery('simple', %s) AS query
+        WHERE kind = %s AND object_id = {pk}
+    """
+
+    def terms(self, query):
+        tsquery = " & ".join(f"{token}:*" for token in search_tokens(query))
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return tsquery, pattern
+
+    def search(self, query, kinds, limit):
+        tsquery, pattern = self.terms(query)
+        sql = self.sql.format(vector=self.vector, kinds=", ".join(["%s"] * len(kinds)))
+        return self.hits(sql, [query, tsquery, *kinds, pattern, limit])
+
+    def rank(self, queryset, query):
+        tsquery, pattern = self.terms(query)
+        kind = queryset.model._meta.model_name
+        return self.raw_rank(
+            queryset,
+            (self.matches_sql.format(vector=self.vector), [tsquery, kind, pattern]),
+            (self.rank_sql.replace("{vector}", self.vector), [query, tsquery, kind]),
+        )
+
+
+SEARCH_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SqliteSearchBackend,
+}
+
+
+def get_search_backend():
+    if settings.CORE_SEARCH_BACKEND:
+        return import_string(settings.CORE_SEARCH_BACKEND)()
+    return SEARCH_BACKENDS.get(connection.vendor, DatabaseSearchBackend)()
+
+
+def rank(queryset, query):
+    return get_search_backend().rank(queryset, query)
+
+
+def search(query, kinds=None, limit=10):
+    if not search_tokens(query):
+        return []
+    return get_search_backend().search(query, list(kinds or SEARCH_FIELDS), limit)
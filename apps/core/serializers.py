@@ -1,86 +1,93 @@
 from rest_framework import serializers
 
 from .models import *
+from .jobs import get_phases
+from .expansion import ExpandableSerializerMixin
+from .search import SEARCH_FIELDS
+
+
+def hidden_fields(model):
+    return ['swapi_url', 'fingerprint'] + [f"{name}_value" for name in model.numeric_fields]
 
 
 #============== write only serializers ==============
-class PlanetSerializer(serializers.ModelSerializer):
+class PlanetSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Planet
-        fields = '__all__'
+        exclude = hidden_fields(Planet)
         read_only_fields = ['created_at', 'updated_at']
 
 
 class SpeciesSerializer(serializers.ModelSerializer):
     class Meta:
         model = Species
-        fields = '__all__'
+        exclude = hidden_fields(Species)
         read_only_fields = ['created_at', 'updated_at']
 
 
 class CharacterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Character
-        fields = '__all__'
+        exclude = hidden_fields(Character)
         read_only_fields = ['created_at', 'updated_at']
 
 
 class VehicleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vehicle
-        fields = '__all__'
+        exclude = hidden_fields(Vehicle)
         read_only_fields = ['created_at', 'updated_at']
 
 
 class StarshipSerializer(serializers.ModelSerializer):
     class Meta:
         model = Starship
-        fields = '__all__'
+        exclude = hidden_fields(Starship)
         read_only_fields = ['created_at', 'updated_at']
 
 
 class FilmSerializer(serializers.ModelSerializer):
     class Meta:
         model = Film
-        fields = '__all__'
+        exclude = hidden_fields(Film)
         read_only_fields = ['created_at', 'updated_at']
 
 
 #============== read only serializers ==============
-class SpeciesReadOnlySerializer(serializers.ModelSerializer):
+class SpeciesReadOnlySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     planet = PlanetSerializer()
 
     class Meta:
         model = Species
-        fields = '__all__'
+        exclude = hidden_fields(Species)
 
 
-class CharacterReadOnlySerializer(serializers.ModelSerializer):
+class CharacterReadOnlySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     planet = PlanetSerializer()
     species = SpeciesReadOnlySerializer(many=True)
 
     class Meta:
         model = Character
-        fields = '__all__'
+        exclude = hidden_fields(Character)
 
 
-class VehicleReadOnlySerializer(serializers.ModelSerializer):
+class VehicleReadOnlySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     pilots = CharacterReadOnlySerializer(many=True)
 
     class Meta:
         model = Vehicle
-        fields = '__all__'
+        exclude = hidden_fields(Vehicle)
 
 
-class StarshipReadOnlySerializer(serializers.ModelSerializer):
+class StarshipReadOnlySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     pilots = CharacterReadOnlySerializer(many=True)
 
     class Meta:
         model = Starship
-        fields = '__all__'
+        exclude = hidden_fields(Starship)
 
 
-class FilmReadOnlySerializer(serializers.ModelSerializer):
+class FilmReadOnlySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     characters = CharacterReadOnlySerializer(many=True)
     planets = PlanetSerializer(many=True)
     starships = StarshipReadOnlySerializer(many=True)
@@ -89,4 +96,67 @@ class FilmReadOnlySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Film
-        fields = '__all__'
+        exclude = hidden_fields(Film)
+
+
+class SyncJobSerializer(serializers.ModelSerializer):
+    phases = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SyncJob
+        fields = ['id', 'status', 'phases', 'report', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def get_phases(self, obj):
+        return get_phases(obj)
+
+
+def parse_types(value):
+    types = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in types if name not in SEARCH_FIELDS]
+    if unknown:
+        raise serializers.ValidationError(f"Unknown types: {', '.join(unknown)}.")
+    return types
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField()
+    types = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+    def validate_types(self, value):
+        return parse_types(value)
+
+
+class SearchHitSerializer(serializers.Serializer):
+    type = serializers.CharField()
+    id = serializers.UUIDField()
+    title = serializers.CharField()
+    rank = serializers.FloatField()
+    url = serializers.CharField()
+
+
+class GraphNodeSerializer(serializers.Serializer):
+    type = serializers.CharField()
+    id = serializers.UUIDField()
+    title = serializers.CharField()
+    url = serializers.CharField()
+
+
+class NeighboursQuerySerializer(serializers.Serializer):
+    types = serializers.CharField(required=False)
+
+    def validate_types(self, value):
+        return parse_types(value)
+
+
+class CoAppearancesQuerySerializer(serializers.Serializer):
+    via = serializers.ChoiceField(choices=list(SEARCH_FIELDS), default="film")
+
+
+class PathQuerySerializer(serializers.Serializer):
+    source = serializers.UUIDField()
+    target = serializers.UUIDField()
+    via = serializers.CharField(required=False)
+
+    def validate_via(self, value):
+        return parse_types(value)
@@ -0,0 +1,62 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
+from .cache import DEPENDENCIES, bump_on_commit
+from .documents import films_embedding, schedule_rebuild
+from .search import index_objects, remove_objects
+
+
+def model_changed(sender, instance, signal, **kwargs):
+    # the documents of the films embedding the row are rebuilt before the
+    # generations are bumped so that no stale document gets cached
+    if signal is post_save:
+        schedule_rebuild(films_embedding(sender, [instance.pk]))
+    bump_on_commit(sender)
+
+
+def model_deleting(sender, instance, **kwargs):
+    # the films embedding a deleted row are found while it is still linked to them
+    schedule_rebuild(films_embedding(sender, [instance.pk]))
+
+
+def update_search_index(sender, instance, signal, **kwargs):
+    if signal is post_delete:
+        remove_objects(sender, [instance.pk])
+    else:
+        index_objects(sender, [instance.pk])
+
+
+def linked_pks(through, instance, model):
+    # the rows of `model` linked to the instance through the table
+    source = next(field for field in through._meta.fields if field.related_model is model)
+    target = next(field for field in through._meta.fields if field.related_model is type(instance))
+    return set(through.objects.filter(**{target.attname: instance.pk}).values_list(source.attname, flat=True))
+
+
+def relation_changed(sender, instance, model, action, reverse=False, pk_set=None, **kwargs):
+    # a clear from the other side is handled before the links are gone, to know the rows it changes
+    if reverse and action == "pre_clear":
+        pk_set = linked_pks(sender, instance, model)
+    elif not action.startswith("post_") or (reverse and action == "post_clear"):
+        return
+
+    # the rows holding the relation no longer match their upstream records,
+    # and the films embedding them are rebuilt
+    source, pks = (model, pk_set) if reverse else (type(instance), [instance.pk])
+    source.objects.filter(pk__in=pks).update(fingerprint="")
+    schedule_rebuild(films_embedding(source, pks))
+    bump_on_commit(type(instance), model)
+
+
+def connect():
+    for model in DEPENDENCIES:
+        post_save.connect(model_changed, sender=model, dispatch_uid=f"core_cache_save_{model.__name__}")
+        post_delete.connect(model_changed, sender=model, dispatch_uid=f"core_cache_delete_{model.__name__}")
+        pre_delete.connect(model_deleting, sender=model, dispatch_uid=f"core_documents_delete_{model.__name__}")
+        post_save.connect(update_search_index, sender=model, dispatch_uid=f"core_search_save_{model.__name__}")
+        post_delete.connect(update_search_index, sender=model, dispatch_uid=f"core_search_delete_{model.__name__}")
+        for field in model._meta.many_to_many:
+            m2m_changed.connect(
+                relation_changed,
+                sender=field.remote_field.through,
+                dispatch_uid=f"core_cache_m2m_{model.__name__}_{field.name}",
+            )
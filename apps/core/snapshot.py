@@ -0,0 +1,98 @@
+import gzip
+import json
+from django.db import models
+
+from .models import *
+from .sync_data import RESOURCE_MODELS, SWAPI_RESOURCES, load_resources
+
+
+# model fields that SWAPI names differently
+UPSTREAM_NAMES = {"planet": "homeworld"}
+
+SKIPPED_FIELDS = {"id", "created_at", "updated_at", "swapi_url", "fingerprint"}
+
+
+def open_snapshot(path, mode):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def object_urls(resource):
+    # synced rows keep their upstream url, rows created locally get a snapshot one
+    return {
+        pk: swapi_url or f"snapshot://{resource}/{pk}/"
+        for pk, swapi_url in RESOURCE_MODELS[resource].objects.values_list("pk", "swapi_url")
+    }
+
+
+def export_records(resource, urls):
+    # builds SWAPI-shaped records so that the import goes through the same
+    # url -> object mapping as a sync from swapi.info
+    model = RESOURCE_MODELS[resource]
+    model_resources = {model: name for name, model in RESOURCE_MODELS.items()}
+
+    skipped = SKIPPED_FIELDS | {f"{name}_value" for name in model.numeric_fields}
+    scalar_fields = []
+    foreign_keys = []
+    many_to_many = []
+    for field in model._meta.get_fields():
+        if field.auto_created or field.name in skipped:
+            continue
+        if field.many_to_many:
+            many_to_many.append(field)
+        elif field.is_relation:
+            foreign_keys.append(field)
+        else:
+            scalar_fields.append(field)
+
+    links = {}
+    for field in many_to_many:
+        target_resource = model_resources[field.related_model]
+        source = f"{field.m2m_field_name()}_id"
+        target = f"{field.m2m_reverse_field_name()}_id"
+        field_links = links[field.name] = {}
+        for source_id, target_id in field.remote_field.through.objects.values_list(source, target):
+            field_links.setdefault(source_id, []).append(urls[target_resource][target_id])
+
+    values = ["pk"] + [field.attname for field in scalar_fields + foreign_keys]
+    for row in model.objects.order_by("pk").values(*values):
+        record = {"url": urls[resource][row["pk"]]}
+        for field in scalar_fields:
+            value = row[field.attname]
+            record[field.name] = value.isoformat() if isinstance(field, models.DateField) else value
+        for field in foreign_keys:
+            target_id = row[field.attname]
+            target_resource = model_resources[field.related_model]
+            record[UPSTREAM_NAMES.get(field.name, field.name)] = (
+                urls[target_resource][target_id] if target_id else None
+            )
+        for field in many_to_many:
+            record[field.name] = links[field.name].get(row["pk"], [])
+        yield record
+
+
+def export_snapshot(path):
+    counts = {}
+    urls = {resource: object_urls(resource) for resource in SWAPI_RESOURCES}
+    with open_snapshot(path, "w") as snapshot:
+        for resource in SWAPI_RESOURCES:
+            counts[resource] = 0
+            for record in export_records(resource, urls):
+                snapshot.write(json.dumps({"resource": resource, "data": record}, separators=(",", ":")) + "\n")
+                counts[resource] += 1
+    return counts
+
+
+def read_snapshot(path):
+    resources = {resource: [] for resource in SWAPI_RESOURCES}
+    with open_snapshot(path, "r") as snapshot:
+        for line in snapshot:
+            if line.strip():
+                entry = json.loads(line)
+                resources[entry["resource"]].append(entry["data"])
+    return resources
+
+
+def import_snapshot(path):
+    return load_resources(read_snapshot(path))
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .cache import get_version
+from .models import *
+
+
+def characters_per_planet():
+    return Planet.objects.values("id", "name").annotate(count=Count("characters")).order_by("-count", "name")
+
+
+def species_distribution():
+    return Species.objects.values("id", "name", "classification").annotate(
+        count=Count("characters")
+    ).order_by("-count", "name")
+
+
+def films_per_character():
+    return Character.objects.values("id", "name").annotate(count=Count("films")).order_by("-count", "name")
+
+
+def pilots_per_starship_class():
+    return Starship.objects.values("starship_class").annotate(
+        starships=Count("id", distinct=True), pilots=Count("pilots", distinct=True)
+    ).order_by("-pilots", "starship_class")
+
+
+def population_per_climate():
+    rows = Planet.objects.values("climate").annotate(
+        planets=Count("id"),
+        population=Sum("population_value"),
+        unknown=Count("id", filter=Q(population_value__isnull=True)),
+    ).order_by("climate")
+    # summed from the parsed populations, which are floats
+    return [dict(row, population=row["population"] and int(row["population"])) for row in rows]
+
+
+# name: (query, models whose writes change the result)
+STATS = {
+    "characters-per-planet": (characters_per_planet, [Planet, Character]),
+    "species-distribution": (species_distribution, [Species, Character]),
+    "films-per-character": (films_per_character, [Character, Film]),
+    "pilots-per-starship-class": (pilots_per_starship_class, [Starship, Character]),
+    "population-per-climate": (population_per_climate, [Planet]),
+}
+
+
+def get_stats(name):
+    # cached until a write or a sync bumps the generation of one of the models
+    query, models = STATS[name]
+    key = f"core:stats:{name}:{'.'.join(map(str, get_version(models)))}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(query())
+        cache.set(key, rows, timeout=settings.CORE_RESPONSE_CACHE_TIMEOUT)
+    return rows
@@ -1,231 +1,439 @@
+import hashlib
+import json
 import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 
 from .models import *
+from .cache import bump_on_commit
+from .http_cache import CachedResource, body_hash, get_response_cache
+from .numbers import numeric_values
+from .search import index_objects
 from api.exceptions import SyncFailed
 
 
-def fetch_all(url):
+BATCH_SIZE = 500
+SWAPI_RESOURCES = ["planets", "species", "people", "vehicles", "starships", "films"]
+SYNC_PHASES = ["fetch"] + SWAPI_RESOURCES
+
+_session = None
+
+
+def get_session():
+    # one keep-alive pool shared by every fetch, sized so that all the
+    # resources can be downloaded in parallel
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=len(SWAPI_RESOURCES))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+RESOURCE_MODELS = {
+    "planets": Planet,
+    "species": Species,
+    "people": Character,
+    "vehicles": Vehicle,
+    "starships": Starship,
+    "films": Film,
+}
+
+
+def fetch_all(url, cache=None):
+    # returns the parsed collection, or a CachedResource when the upstream data did
+    # not change since the last sync, together with the cache entry to store once
+    # the data has been loaded
+    entry = cache.get(url) if cache else None
+    if entry and entry.get("index") is not None and cache.is_fresh(entry):
+        return CachedResource(cache, entry), None
+
     try:
-        response = requests.get(url)
+        headers = cache.conditional_headers(entry) if entry else {}
+        response = get_session().get(url, headers=headers, timeout=settings.SWAPI_TIMEOUT)
+        if entry and response.status_code == 304:
+            return CachedResource(cache, entry), dict(entry, fetched_at=time.time())
         response.raise_for_status()
-        data = response.json()
-        return data
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
         raise e
 
-
-@transaction.atomic
-def sync():
+    if cache is None:
+        return response.json(), None
+
+    body = response.content
+    new_entry = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "hash": body_hash(body),
+        "fetched_at": time.time(),
+    }
+    if entry and entry.get("index") is not None and entry["hash"] == new_entry["hash"]:
+        return CachedResource(cache, entry), dict(entry, **new_entry)
+    return response.json(), (new_entry, body)
+
+
+def fetch_resources():
+    cache = get_response_cache()
+    with ThreadPoolExecutor(max_workers=len(SWAPI_RESOURCES)) as executor:
+        futures = {
+            resource: executor.submit(fetch_all, f"{settings.SWAPI_BASE_URL}{resource}/", cache)
+            for resource in SWAPI_RESOURCES
+        }
+        results = {resource: future.result() for resource, future in futures.items()}
+
+    resources = {resource: data for resource, (data, _) in results.items()}
+    pending = {resource: entry for resource, (_, entry) in results.items() if entry is not None}
+    return resources, pending, cache
+
+
+def store_responses(resources, pending, cache):
+    # only runs after the data was committed, so an entry always describes rows
+    # that are in the database
+    for resource, entry in pending.items():
+        body = None
+        if isinstance(entry, tuple):
+            entry, body = entry
+            entry["index"] = [item["url"] for item in resources[resource]]
+        cache.store(entry, body)
+
+
+def sync(progress=None):
+    progress = progress or (lambda phase, state: None)
     try:
-        planets = sync_planets()
-        species = sync_species(planets)
-        characters = sync_characters(planets, species)
-        vehicles = sync_vehicles(characters)
-        starships = sync_starships(characters)
-        films = sync_films(characters, planets, species, vehicles, starships)
+        resources, pending, cache = run_phase(progress, "fetch", fetch_resources)
+        report = load_resources(resources, progress)
+        if cache is not None:
+            store_responses(resources, pending, cache)
+        return report
     except Exception as e:
         raise SyncFailed()
 
 
-def sync_planets():
-    planet_map = {}
-    retrieved_planets = fetch_all("https://swapi.info/api/planets/")
-    for item in retrieved_planets:
-        obj, _ = Planet.objects.update_or_create(
-            name=item['name'],
-            defaults={
-                "rotation_period": item["rotation_period"],
-                "orbital_period": item["orbital_period"],
-                "diameter": item["diameter"],
-                "climate": item["climate"],
-                "gravity": item["gravity"],
-                "terrain": item["terrain"],
-                "surface_water": item["surface_water"],
-                "population": item["population"]
-            }
-        )
-        planet_map[item["url"]] = obj
-    return planet_map
-
-
-def sync_species(planets):
-    species_map = {}
-    retrieved_species = fetch_all("https://swapi.info/api/species/")
-    for item in retrieved_species:
-        obj, _ = Species.objects.update_or_create(
-            name=item["name"],
-            defaults={
-                "classification": item["classification"],
-                "designation": item["designation"],
-                "average_height": item["average_height"],
-                "skin_colors": item["skin_colors"],
-                "hair_colors": item["hair_colors"],
-                "eye_colors": item["eye_colors"],
-                "average_lifespan": item["average_lifespan"],
-                "language": item["language"],
-                "planet": planets.get(item["homeworld"], None),
-            }
-        )
-        species_map[item["url"]] = obj
-    return species_map
-
-
-def sync_characters(planets_map, species_map):
-    character_map = {}
-    for item in fetch_all("https://swapi.info/api/people/"):
-        obj, _ = Character.objects.update_or_create(
-            name=item["name"],
-            defaults={
-                "height": item["height"],
-                "mass": item["mass"],
-                "hair_color": item["hair_color"],
-                "skin_color": item["skin_color"],
-                "eye_color": item["eye_color"],
-                "birth_year": item["birth_year"],
-                "gender": item["gender"],
-                "planet": planets_map.get(item["homeworld"], None),
-            }
-        )
+def run_phase(progress, phase, func, *args):
+    progress(phase, "running")
+    result = func(*args)
+    progress(phase, "completed")
+    return result
 
-        species_to_be_added = []
-        for url in item.get("species", []):
-            if url in species_map:
-                species_to_be_added.append(species_map[url])
-        obj.species.set(species_to_be_added)
-
-        character_map[item["url"]] = obj
-    return character_map
-
-
-def sync_characters(planets_map, species_map):
-    character_map = {}
-    for item in fetch_all("https://swapi.info/api/people/"):
-        obj, _ = Character.objects.update_or_create(
-            name=item["name"],
-            defaults={
-                "height": item["height"],
-                "mass": item["mass"],
-                "hair_color": item["hair_color"],
-                "skin_color": item["skin_color"],
-                "eye_color": item["eye_color"],
-                "birth_year": item["birth_year"],
-                "gender": item["gender"],
-                "planet": planets_map.get(item["homeworld"], None),
-            }
-        )
 
-        species_to_be_added = []
-        for url in item.get("species", []):
-            if url in species_map:
-                species_to_be_added.append(species_map[url])
-        obj.species.set(species_to_be_added)
-
-        character_map[item["url"]] = obj
-    return character_map
-
-
-def sync_vehicles(character_map):
-    vehicle_map = {}
-    for item in fetch_all("https://swapi.info/api/vehicles/"):
-        obj, _ = Vehicle.objects.update_or_create(
-            name=item["name"],
-            defaults={
-                "model": item["model"],
-                "manufacturer": item["manufacturer"],
-                "cost_in_credits": item["cost_in_credits"],
-                "length": item["length"],
-                "max_atmosphering_speed": item["max_atmosphering_speed"],
-                "crew": item["crew"],
-                "passengers": item["passengers"],
-                "cargo_capacity": item["cargo_capacity"],
-                "consumables": item["consumables"],
-                "vehicle_class": item["vehicle_class"],
-            }
-        )
+def load_phase(resources, resource, object_maps, report):
+    items = resources[resource]
+    func, dependencies = SYNC_FUNCTIONS[resource]
+    if isinstance(items, CachedResource):
+        # rows linking to a resource that gained or lost rows in this run are relinked from the body
+        relink = any(report[name]["created"] or report[name]["removed"] for name in dependencies)
+        object_map = None if relink else cached_object_map(resource, items.index)
+        if object_map is not None:
+            return object_map, {"created": 0, "updated": 0, "unchanged": len(items.index), "removed": 0}
+        items = items.load()
+    return func(items, *(object_maps[name] for name in dependencies))
 
-        character_to_be_added = []
-        for url in item.get("pilots", []):
-            if url in character_map:
-                character_to_be_added.append(character_map[url])
-        obj.pilots.set(character_to_be_added)
-
-        vehicle_map[item["url"]] = obj
-    return vehicle_map
-
-
-def sync_starships(character_map):
-    starship_map = {}
-    for item in fetch_all("https://swapi.info/api/starships/"):
-        obj, _ = Starship.objects.update_or_create(
-            name=item["name"],
-            defaults={
-                "model": item["model"],
-                "manufacturer": item["manufacturer"],
-                "cost_in_credits": item["cost_in_credits"],
-                "length": item["length"],
-                "max_atmosphering_speed": item["max_atmosphering_speed"],
-                "crew": item["crew"],
-                "passengers": item["passengers"],
-                "cargo_capacity": item["cargo_capacity"],
-                "consumables": item["consumables"],
-                "hyperdrive_rating": item["hyperdrive_rating"],
-                "MGLT": item["MGLT"],
-                "starship_class": item["starship_class"],
-            }
-        )
-
-        characters_to_be_added = []
-        for url in item.get("pilots", []):
-            if url in character_map:
-                characters_to_be_added.append(character_map[url])
-
-        obj.pilots.set(characters_to_be_added)
 
-        starship_map[item["url"]] = obj
-    return starship_map
+def cached_object_map(resource, index):
+    # maps the urls of an unchanged collection to its rows without parsing the
+    # body, unless some of the rows are no longer in the database or were
+    # changed locally
+    urls = set(index)
+    rows = RESOURCE_MODELS[resource].objects.filter(swapi_url__in=urls).exclude(fingerprint="")
+    object_map = {obj.swapi_url: obj for obj in rows}
+    if len(object_map) != len(urls):
+        return None
+    return object_map
 
 
-def sync_films(character_map, planet_map, species_map, vehicle_map, starship_map):
-    for item in fetch_all("https://swapi.info/api/films/"):
-        obj, _ = Film.objects.update_or_create(
-            title=item["title"],
-            defaults={
-                "episode_id": item["episode_id"],
-                "opening_crawl": item["opening_crawl"],
-                "director": item["director"],
-                "producer": item["producer"],
-                "release_date": item["release_date"],
-            }
+@transaction.atomic
+def load_resources(resources, progress=None):
+    progress = progress or (lambda phase, state: None)
+    report = {}
+    object_maps = {}
+    for resource in SWAPI_RESOURCES:
+        object_maps[resource], report[resource] = run_phase(
+            progress, resource, load_phase, resources, resource, object_maps, report
         )
 
-        characters_to_be_added = []
-        for url in item.get("characters", []):
-            if url in character_map:
-                characters_to_be_added.append(character_map[url])
-        obj.characters.set(characters_to_be_added)
-
-        planets_to_be_added = []
-        for url in item.get("planets", []):
-            if url in planet_map:
-                planets_to_be_added.append(planet_map[url])
-        obj.planets.set(planets_to_be_added)
-
-        species_to_be_added = []
-        for url in item.get("species", []):
-            if url in species_map:
-                species_to_be_added.append(species_map[url])
-        obj.species.set(species_to_be_added)
-
-        vehicles_to_be_added = []
-        for url in item.get("vehicles", []):
-            if url in vehicle_map:
-                vehicles_to_be_added.append(vehicle_map[url])
-        obj.vehicles.set(vehicles_to_be_added)
-
-        starships_to_be_added = []
-        for url in item.get("starships", []):
-            if url in starship_map:
-                starships_to_be_added.append(starship_map[url])
-        obj.starships.set(starships_to_be_added)
+    # bulk writes send no signals, so the cached responses are invalidated and
+    # the search index is updated here
+    changed_models = [
+        RESOURCE_MODELS[resource] for resource, stats in report.items()
+        if stats["created"] or stats["updated"] or stats["removed"]
+    ]
+    if changed_models:
+        bump_on_commit(*changed_models)
+        for model in changed_models:
+            index_objects(model)
+        # imported here, documents import the serializers that import the jobs that import this module
+        from .documents import build_documents
+        build_documents()
+    return report
+
+
+def fingerprint(item):
+    return hashlib.sha256(json.dumps(item, sort_keys=True).encode()).hexdigest()
+
+
+def bulk_upsert(model, items, lookup_field, build_defaults):
+    # rows are identified by their upstream url. One query loads the rows of the
+    # upstream urls, the rows synced from the same source (to find the ones that
+    # disappeared upstream) and, by name, the rows synced before urls were stored.
+    # Only the new and changed rows are then written with bulk_create and bulk_update.
+    urls = {item["url"] for item in items}
+    names = {item[lookup_field] for item in items}
+    existing = {}
+    unclaimed = {}
+    stale = []
+    rows = model.objects.filter(
+        Q(swapi_url__in=urls)
+        | Q(swapi_url__startswith=settings.SWAPI_BASE_URL)
+        | Q(swapi_url__isnull=True, **{f"{lookup_field}__in": names})
+    )
+    for obj in rows:
+        if obj.swapi_url is None:
+            unclaimed[getattr(obj, lookup_field)] = obj
+        elif obj.swapi_url in urls:
+            existing[obj.swapi_url] = obj
+        else:
+            stale.append(obj.pk)
+
+    now = timezone.now()
+    object_map = {}
+    changed = set()
+    to_create = {}
+    to_update = {}
+    update_fields = {"updated_at"}
+    unchanged = 0
+    for item in items:
+        url = item["url"]
+        item_fingerprint = fingerprint(item)
+
+        obj = existing.get(url)
+        if obj is None:
+            obj = existing[url] = unclaimed.pop(item[lookup_field], None)
+        values = build_defaults(item)
+        if (
+            obj is not None and obj.fingerprint == item_fingerprint and obj.swapi_url == url
+            and same_targets(obj, values)
+        ):
+            unchanged += 1
+        else:
+            defaults = {
+                "swapi_url": url,
+                "fingerprint": item_fingerprint,
+                lookup_field: item[lookup_field],
+                **values,
+            }
+            defaults.update(numeric_values(model, defaults))
+            update_fields.update(defaults)
+            if obj is None:
+                obj = existing[url] = to_create[url] = model(**defaults)
+            else:
+                for field, value in defaults.items():
+                    setattr(obj, field, value)
+                if url not in to_create:
+                    obj.updated_at = now
+                    to_update[url] = obj
+            changed.add(url)
+
+        object_map[url] = obj
+
+    model.objects.bulk_create(to_create.values(), batch_size=BATCH_SIZE)
+    model.objects.bulk_update(to_update.values(), fields=sorted(update_fields), batch_size=BATCH_SIZE)
+    for start in range(0, len(stale), BATCH_SIZE):
+        model.objects.filter(pk__in=stale[start:start + BATCH_SIZE]).delete()
+
+    stats = {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "unchanged": unchanged,
+        "removed": len(stale),
+    }
+    return object_map, changed, stats
+
+
+def same_targets(obj, values):
+    # a foreign key target created or deleted in this run changes the row
+    # without changing its upstream record
+    return all(
+        getattr(obj, field.attname) == getattr(values[field.name], "pk", None)
+        for field in obj._meta.concrete_fields
+        if field.is_relation and field.name in values
+    )
+
+
+def resolve(object_map, urls):
+    return [object_map[url] for url in urls if url in object_map]
+
+
+def collect_links(items, object_map, key, target_map):
+    # the links of every object, those of an unchanged object differ from the
+    # stored ones when one of its targets was created or deleted in this run
+    return {
+        object_map[item["url"]].pk: {obj.pk for obj in resolve(target_map, item.get(key, []))}
+        for item in items
+    }
+
+
+def sync_relation(model, field_name, links):
+    # diffs the through table rows of every synced object against the upstream
+    # links at once, instead of calling .set() on each object
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = f"{field.m2m_field_name()}_id"
+    target = f"{field.m2m_reverse_field_name()}_id"
+
+    wanted = {(source_id, target_id) for source_id, target_ids in links.items() for target_id in target_ids}
+    existing = {}
+    source_ids = list(links)
+    for start in range(0, len(source_ids), BATCH_SIZE):
+        rows = through.objects.filter(**{f"{source}__in": source_ids[start:start + BATCH_SIZE]})
+        for pk, source_id, target_id in rows.values_list("pk", source, target):
+            existing[(source_id, target_id)] = pk
+
+    stale = {key: pk for key, pk in existing.items() if key not in wanted}
+    stale_pks = list(stale.values())
+    for start in range(0, len(stale_pks), BATCH_SIZE):
+        through.objects.filter(pk__in=stale_pks[start:start + BATCH_SIZE]).delete()
+
+    added = wanted - existing.keys()
+    through.objects.bulk_create(
+        [through(**{source: source_id, target: target_id}) for source_id, target_id in added],
+        batch_size=BATCH_SIZE,
+    )
+    # the objects whose links changed
+    return {source_id for source_id, _ in added | stale.keys()}
+
+
+def mark_relinked(model, object_map, changed, stats, relinked):
+    # objects whose links alone changed are updated as well
+    relinked = list(relinked - {object_map[url].pk for url in changed})
+    now = timezone.now()
+    for start in range(0, len(relinked), BATCH_SIZE):
+        model.objects.filter(pk__in=relinked[start:start + BATCH_SIZE]).update(updated_at=now)
+    stats["updated"] += len(relinked)
+    stats["unchanged"] -= len(relinked)
+
+
+def sync_planets(retrieved_planets):
+    planet_map, _, stats = bulk_upsert(Planet, retrieved_planets, "name", lambda item: {
+        "rotation_period": item["rotation_period"],
+        "orbital_period": item["orbital_period"],
+        "diameter": item["diameter"],
+        "climate": item["climate"],
+        "gravity": item["gravity"],
+        "terrain": item["terrain"],
+        "surface_water": item["surface_water"],
+        "population": item["population"]
+    })
+    return planet_map, stats
+
+
+def sync_species(retrieved_species, planets):
+    species_map, _, stats = bulk_upsert(Species, retrieved_species, "name", lambda item: {
+        "classification": item["classification"],
+        "designation": item["designation"],
+        "average_height": item["average_height"],
+        "skin_colors": item["skin_colors"],
+        "hair_colors": item["hair_colors"],
+        "eye_colors": item["eye_colors"],
+        "average_lifespan": item["average_lifespan"],
+        "language": item["language"],
+        "planet": planets.get(item.get("homeworld"), None),
+    })
+    return species_map, stats
+
+
+def sync_characters(retrieved_characters, planets_map, species_map):
+    character_map, changed, stats = bulk_upsert(Character, retrieved_characters, "name", lambda item: {
+        "height": item["height"],
+        "mass": item["mass"],
+        "hair_color": item["hair_color"],
+        "skin_color": item["skin_color"],
+        "eye_color": item["eye_color"],
+        "birth_year": item["birth_year"],
+        "gender": item["gender"],
+        "planet": planets_map.get(item.get("homeworld"), None),
+    })
+
+    relinked = sync_relation(Character, "species", collect_links(retrieved_characters, character_map, "species", species_map))
+    mark_relinked(Character, character_map, changed, stats, relinked)
+    return character_map, stats
+
+
+def sync_vehicles(retrieved_vehicles, character_map):
+    vehicle_map, changed, stats = bulk_upsert(Vehicle, retrieved_vehicles, "name", lambda item: {
+        "model": item["model"],
+        "manufacturer": item["manufacturer"],
+        "cost_in_credits": item["cost_in_credits"],
+        "length": item["length"],
+        "max_atmosphering_speed": item["max_atmosphering_speed"],
+        "crew": item["crew"],
+        "passengers": item["passengers"],
+        "cargo_capacity": item["cargo_capacity"],
+        "consumables": item["consumables"],
+        "vehicle_class": item["vehicle_class"],
+    })
+
+    relinked = sync_relation(Vehicle, "pilots", collect_links(retrieved_vehicles, vehicle_map, "pilots", character_map))
+    mark_relinked(Vehicle, vehicle_map, changed, stats, relinked)
+    return vehicle_map, stats
+
+
+def sync_starships(retrieved_starships, character_map):
+    starship_map, changed, stats = bulk_upsert(Starship, retrieved_starships, "name", lambda item: {
+        "model": item["model"],
+        "manufacturer": item["manufacturer"],
+        "cost_in_credits": item["cost_in_credits"],
+        "length": item["length"],
+        "max_atmosphering_speed": item["max_atmosphering_speed"],
+        "crew": item["crew"],
+        "passengers": item["passengers"],
+        "cargo_capacity": item["cargo_capacity"],
+        "consumables": item["consumables"],
+        "hyperdrive_rating": item["hyperdrive_rating"],
+        "MGLT": item["MGLT"],
+        "starship_class": item["starship_class"],
+    })
+
+    relinked = sync_relation(Starship, "pilots", collect_links(retrieved_starships, starship_map, "pilots", character_map))
+    mark_relinked(Starship, starship_map, changed, stats, relinked)
+    return starship_map, stats
+
+
+def sync_films(retrieved_films, character_map, planet_map, species_map, vehicle_map, starship_map):
+    film_map, changed, stats = bulk_upsert(Film, retrieved_films, "title", lambda item: {
+        "episode_id": item["episode_id"],
+        "opening_crawl": item["opening_crawl"],
+        "director": item["director"],
+        "producer": item["producer"],
+        "release_date": item["release_date"],
+    })
+
+    relinked = set()
+    for field_name, target_map in [
+        ("characters", character_map),
+        ("planets", planet_map),
+        ("species", species_map),
+        ("vehicles", vehicle_map),
+        ("starships", starship_map),
+    ]:
+        relinked |= sync_relation(Film, field_name, collect_links(retrieved_films, film_map, field_name, target_map))
+    mark_relinked(Film, film_map, changed, stats, relinked)
+    return film_map, stats
+
+
+# resource: (sync function, resources whose object maps it links to)
+SYNC_FUNCTIONS = {
+    "planets": (sync_planets, []),
+    "species": (sync_species, ["planets"]),
+    "people": (sync_characters, ["planets", "species"]),
+    "vehicles": (sync_vehicles, ["people"]),
+    "starships": (sync_starships, ["people"]),
+    "films": (sync_films, ["people", "planets", "species", "vehicles", "starships"]),
+}
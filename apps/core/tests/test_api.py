@@ -1,21 +1,65 @@
+import base64
+import json
 from datetime import date
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 
-from ..models import Character, Starship, Film
+from ..cache import bump, generation_key
+from ..models import Character, Starship, Film, Planet
 
 User = get_user_model()
 
 
 class BaseAPITestCase(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username="testuser", password="pass1234", email="example12@email.com")
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
 
+def make_planet(**fields):
+    return Planet.objects.create(**{
+        "name": "Tatooine", "rotation_period": "23", "orbital_period": "304", "diameter": "10465", "climate": "arid",
+        "gravity": "1 standard", "terrain": "desert", "surface_water": "1", "population": "200000", **fields
+    })
+
+
+def make_character(**fields):
+    return Character.objects.create(**{
+        "name": "Thomas Gav", "height": "180", "mass": "85", "hair_color": "Black", "skin_color": "Fair",
+        "eye_color": "Brown", "birth_year": "1997", "gender": "Male", **fields
+    })
+
+
+def make_starship(pilots=(), **fields):
+    starship = Starship.objects.create(**{
+        "name": "Amazing Starship", "model": "Latest Model 3", "manufacturer": "Ferrari",
+        "cost_in_credits": "23000000", "length": "15", "max_atmosphering_speed": "1050", "crew": "25",
+        "passengers": "30", "cargo_capacity": "110", "consumables": "1 week", "hyperdrive_rating": "1.0",
+        "MGLT": "100", "starship_class": "Starfighter", **fields
+    })
+    starship.pilots.set(pilots)
+    return starship
+
+
+def make_film(characters=(), planets=(), starships=(), **fields):
+    film = Film.objects.create(**{
+        "title": "New Star Wars Movie", "episode_id": 12, "opening_crawl": "In a galaxy far far way ......",
+        "director": "Christopher Nolan", "producer": "Unknown", "release_date": date(2026, 5, 19), **fields
+    })
+    film.characters.set(characters)
+    film.planets.set(planets)
+    film.starships.set(starships)
+    return film
+
+
 class CharacterTests(BaseAPITestCase):
     def create_dummy_character(self):
         character = Character.objects.create(
@@ -469,3 +513,344 @@ class FilmTests(BaseAPITestCase):
         client = APIClient()
         response = client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ResponseCacheTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.planet = make_planet()
+        self.character = make_character(planet=self.planet)
+
+    def test_repeated_list_is_served_from_cache(self):
+        url = reverse("character-list")
+        first = self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+
+        self.assertEqual(second.data, first.data)
+        core_queries = [query for query in queries.captured_queries if "core_" in query["sql"]]
+        self.assertEqual(core_queries, [])
+
+    def test_dependency_write_invalidates_cached_response(self):
+        url = reverse("character-detail", args=[self.character.id])
+        self.client.get(url)
+
+        response = self.client.patch(reverse("planet-detail", args=[self.planet.id]), {"name": "Naboo"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data["planet"]["name"], "Naboo")
+
+    def test_query_parameters_are_part_of_the_key(self):
+        url = reverse("character-list")
+        self.client.get(url)
+
+        response = self.client.get(url, {"search": "nobody"})
+        self.assertEqual(len(response.data["results"]), 0)
+
+    @override_settings(ALLOWED_HOSTS=["internal.local", "public.example.com"])
+    def test_host_and_scheme_are_part_of_the_key(self):
+        for index in range(10):
+            make_character(name=f"Character {index}")
+        url = reverse("character-list")
+        self.client.get(url, HTTP_HOST="internal.local")
+
+        response = self.client.get(url, HTTP_HOST="public.example.com", secure=True)
+        self.assertEqual(response.data["next"], "https://public.example.com/api/character/?page=2")
+
+    def test_evicted_generation_does_not_serve_stale_responses(self):
+        url = reverse("character-detail", args=[self.character.id])
+        self.client.get(url)
+
+        # counted again from the same number after the eviction
+        cache.delete(generation_key(Planet))
+        Planet.objects.filter(pk=self.planet.pk).update(name="Naboo")
+        bump(Planet)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data["planet"]["name"], "Naboo")
+
+
+class ExpansionTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.planet = make_planet()
+        self.character = make_character(planet=self.planet)
+        self.ship = make_starship(pilots=[self.character])
+        self.film = make_film(characters=[self.character], planets=[self.planet], starships=[self.ship])
+
+    def test_default_shape_is_fully_expanded(self):
+        response = self.client.get(reverse("film-detail", args=[self.film.id]))
+        self.assertEqual(response.data["starships"][0]["pilots"][0]["planet"]["name"], "Tatooine")
+
+    def test_unexpanded_relations_are_ids(self):
+        response = self.client.get(reverse("film-detail", args=[self.film.id]), {"expand": ""})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["starships"], [self.ship.id])
+        self.assertEqual(response.data["characters"], [self.character.id])
+        self.assertEqual(response.data["vehicles"], [])
+
+    def test_nested_expansion(self):
+        response = self.client.get(reverse("film-detail", args=[self.film.id]), {"expand": "starships.pilots"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pilot = response.data["starships"][0]["pilots"][0]
+        self.assertEqual(pilot["name"], "Thomas Gav")
+        self.assertEqual(pilot["planet"], self.planet.id)
+        self.assertEqual(response.data["planets"], [self.planet.id])
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse("film-list"), {"fields": "title,starships", "expand": ""})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0], {"title": "New Star Wars Movie", "starships": [self.ship.id]})
+
+    def test_prefetches_only_what_is_expanded(self):
+        url = reverse("film-list")
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(url, {"expand": "characters.species,starships.pilots,vehicles.pilots"})
+        cache.clear()
+        with CaptureQueriesContext(connection) as sparse:
+            self.client.get(url, {"fields": "title,characters", "expand": ""})
+
+        def core_queries(queries):
+            return [
+                query for query in queries.captured_queries
+                if "core_" in query["sql"] and not query["sql"].startswith(("EXPLAIN", "INSERT INTO \"silk_"))
+            ]
+
+        # validators, count and films, then only the film -> character link table
+        self.assertEqual(len(core_queries(sparse)), 4)
+        self.assertLess(len(core_queries(sparse)), len(core_queries(full)))
+
+    def test_unknown_field_or_relation_is_rejected(self):
+        url = reverse("film-list")
+        response = self.client.get(url, {"fields": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {"expand": "starships.nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_normalized_list_includes_each_object_once(self):
+        response = self.client.get(reverse("film-list"), {"normalized": "true"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        film = response.data["results"][0]
+        self.assertEqual(film["characters"], [self.character.id])
+        self.assertEqual(film["starships"], [self.ship.id])
+
+        included = response.data["included"]
+        self.assertEqual(list(included["character"]), [str(self.character.id)])
+        self.assertEqual(included["character"][str(self.character.id)]["planet"], self.planet.id)
+        self.assertEqual(included["starship"][str(self.ship.id)]["pilots"], [self.character.id])
+        self.assertEqual(list(included["planet"]), [str(self.planet.id)])
+
+    def test_normalized_retrieve_follows_expand(self):
+        url = reverse("film-detail", args=[self.film.id])
+        response = self.client.get(url, {"normalized": "true", "expand": "starships"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["title"], "New Star Wars Movie")
+        self.assertEqual(list(response.data["included"]), ["starship"])
+
+
+class KeysetPaginationTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(25):
+            Planet.objects.create(
+                name=f"Planet {index}", rotation_period="23", orbital_period="304", diameter="10465",
+                climate="arid", gravity="1 standard", terrain="desert", surface_water="1", population="200000"
+            )
+        # rows created by one bulk insert can share a timestamp, the id breaks the tie
+        Planet.objects.filter(name__in=["Planet 3", "Planet 4", "Planet 5"]).update(
+            created_at=Planet.objects.get(name="Planet 3").created_at
+        )
+
+    def walk(self, url, params=None, link="next"):
+        names = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [planet["name"] for planet in response.data["results"]]
+            if response.data[link] is None:
+                return names, response
+            response = self.client.get(response.data[link])
+
+    def test_cursor_pages_cover_every_row_once(self):
+        names, last = self.walk(reverse("planet-list"), {"pagination": "cursor"})
+        self.assertEqual(len(names), 25)
+        self.assertEqual(len(set(names)), 25)
+        self.assertNotIn("count", last.data)
+
+        back, _ = self.walk(last.data["previous"], link="previous")
+        self.assertEqual(len(back) + len(last.data["results"]), 25)
+
+    def test_cursor_page_does_not_offset(self):
+        first = self.client.get(reverse("planet-list"), {"pagination": "cursor"})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data["next"])
+        planet_queries = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith("SELECT") and "core_planet" in query["sql"]
+        ]
+        self.assertTrue(planet_queries)
+        self.assertFalse(any("OFFSET" in sql for sql in planet_queries))
+
+    def test_page_numbers_stay_the_default(self):
+        response = self.client.get(reverse("planet-list"))
+        self.assertEqual(response.data["count"], 25)
+
+        response = self.client.get(reverse("planet-list"), {"pagination": "sideways"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_cursor_is_not_found(self):
+        for position in ["2020-01-01T00:00:00|notauuid", "notadate|1bd8dd0c-71a0-4a0f-a4c5-000000000000", "2020-01-01T00:00:00"]:
+            cursor = base64.b64encode(f"p={position}".encode()).decode()
+            response = self.client.get(reverse("planet-list"), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_rejects_ordering(self):
+        response = self.client.get(reverse("planet-list"), {"pagination": "cursor", "ordering": "name"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ordering", response.data["errors"])
+
+
+class ExportTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.planet = make_planet()
+        for index in range(15):
+            make_character(name=f"Character {index}", planet=self.planet)
+
+    def export(self, params=None):
+        response = self.client.get(reverse("character-export"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_export_streams_every_row(self):
+        rows = self.export()
+        self.assertEqual(len(rows), 15)
+        self.assertEqual(rows[0]["planet"], str(self.planet.id))
+        self.assertEqual(rows[0]["species"], [])
+
+    def test_export_applies_search_and_expand(self):
+        rows = self.export({"search": "Character 1", "expand": "planet", "fields": "name,planet"})
+        self.assertEqual(sorted(row["name"] for row in rows), ["Character 1"] + [f"Character 1{i}" for i in range(5)])
+        self.assertEqual(rows[0]["planet"]["name"], "Tatooine")
+
+    def test_export_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse("character-export"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ConditionalResponseTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.planet = make_planet()
+        self.character = make_character(planet=self.planet)
+
+    def core_queries(self, queries):
+        return [
+            query for query in queries.captured_queries
+            if query["sql"].startswith("SELECT") and "core_" in query["sql"]
+        ]
+
+    def test_matching_etag_is_not_modified(self):
+        url = reverse("character-list")
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.core_queries(queries), [])
+
+    @override_settings(CORE_RESPONSE_CACHE_TIMEOUT=0)
+    def test_not_modified_without_cached_response_only_reads_validators(self):
+        url = reverse("character-list")
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(self.core_queries(queries)), 1)
+
+    def test_embedded_change_changes_the_etag(self):
+        url = reverse("character-detail", args=[self.character.id])
+        etag = self.client.get(url)["ETag"]
+
+        self.client.patch(reverse("planet-detail", args=[self.planet.id]), {"name": "Naboo"})
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["planet"]["name"], "Naboo")
+
+    def test_evicted_generation_changes_the_etag(self):
+        url = reverse("character-detail", args=[self.character.id])
+        etag = self.client.get(url)["ETag"]
+
+        cache.delete(generation_key(Planet))
+        bump(Planet)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        url = reverse("character-detail", args=[self.character.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE="Sat, 01 Jan 2000 00:00:00 GMT")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_object_is_still_not_found(self):
+        response = self.client.get(reverse("character-detail", args=["1bd8dd0c-71a0-4a0f-a4c5-000000000000"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class NumericFieldTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for name, population in [("Tatooine", "200000"), ("Alderaan", "2,000,000,000"), ("Hoth", "unknown"), ("Naboo", "4500000000")]:
+            make_planet(name=name, population=population)
+
+    def names(self, params):
+        response = self.client.get(reverse("planet-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [planet["name"] for planet in response.data["results"]]
+
+    def test_shadow_columns_are_parsed_on_save(self):
+        self.assertEqual(Planet.objects.get(name="Alderaan").population_value, 2_000_000_000)
+        self.assertIsNone(Planet.objects.get(name="Hoth").population_value)
+
+        planet = Planet.objects.get(name="Hoth")
+        planet.population = "1000"
+        planet.save(update_fields=["population"])
+        self.assertEqual(Planet.objects.get(name="Hoth").population_value, 1000)
+
+    def test_range_filters(self):
+        self.assertEqual(sorted(self.names({"population__gte": 1_000_000})), ["Alderaan", "Naboo"])
+        self.assertEqual(self.names({"population__lt": 1_000_000}), ["Tatooine"])
+        self.assertEqual(self.names({"population__isnull": "true"}), ["Hoth"])
+
+    def test_numeric_ordering_puts_unknown_last(self):
+        self.assertEqual(self.names({"ordering": "population"}), ["Tatooine", "Alderaan", "Naboo", "Hoth"])
+        self.assertEqual(self.names({"ordering": "-population"}), ["Naboo", "Alderaan", "Tatooine", "Hoth"])
+
+    def test_shadow_columns_are_not_exposed(self):
+        response = self.client.get(reverse("planet-list"))
+        self.assertNotIn("population_value", response.data["results"][0])
+
+    def test_sync_columns_are_not_exposed(self):
+        planet = Planet.objects.get(name="Tatooine")
+        Planet.objects.filter(pk=planet.pk).update(swapi_url="https://swapi.info/api/planets/1/")
+        planets = self.client.get(reverse("planet-list")).data["results"]
+        planets.append(self.client.get(reverse("planet-detail", args=[planet.pk])).data)
+        for planet in planets:
+            self.assertNotIn("swapi_url", planet)
+            self.assertNotIn("fingerprint", planet)
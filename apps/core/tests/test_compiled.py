@@ -0,0 +1,57 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from ..benchmark import generate_dataset
+from ..compiled import CompiledSerializer
+from ..expansion import related_lookups
+from ..models import *
+from ..serializers import *
+from ..sync_data import load_resources
+
+
+class CompiledSerializerTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_resources(generate_dataset(0.3, seed=3))
+
+    def assertSameBytes(self, serializer):
+        model = serializer.Meta.model
+        select, prefetch = related_lookups(serializer, model)
+        instances = model.objects.select_related(*select).prefetch_related(*prefetch)
+        expected = JSONRenderer().render(type(serializer)(
+            instances, many=True, fields=serializer.only_fields, expand=serializer.expand
+        ).data)
+
+        compiled = CompiledSerializer(serializer)
+        actual = JSONRenderer().render(compiled.render(list(compiled.values(model.objects.all()))))
+        self.assertEqual(actual, expected)
+
+    def test_default_shapes(self):
+        for serializer_class in [
+            PlanetSerializer, SpeciesReadOnlySerializer, CharacterReadOnlySerializer,
+            VehicleReadOnlySerializer, StarshipReadOnlySerializer, FilmReadOnlySerializer,
+        ]:
+            with self.subTest(serializer_class.__name__):
+                self.assertSameBytes(serializer_class())
+
+    def test_expansions_and_sparse_fields(self):
+        for fields, expand in [
+            (None, {}),
+            (None, {"starships": {"pilots": {}}}),
+            (None, {"characters": {"planet": {}, "species": {"planet": {}}}, "planets": {}}),
+            ({"title", "vehicles", "release_date"}, None),
+            ({"id", "species"}, {"species": {}}),
+        ]:
+            with self.subTest(fields=fields, expand=expand):
+                self.assertSameBytes(FilmReadOnlySerializer(fields=fields, expand=expand))
+
+    def test_one_query_per_relation(self):
+        compiled = CompiledSerializer(FilmReadOnlySerializer())
+        with CaptureQueriesContext(connection) as queries:
+            compiled.render(list(compiled.values(Film.objects.all())))
+        executed = [query for query in queries.captured_queries if not query["sql"].startswith("EXPLAIN")]
+        # films, then characters/planet/species/species planet, planets, starships/pilots/...,
+        # vehicles/pilots/..., species/planet
+        self.assertEqual(len(executed), 1 + 4 + 1 + 5 + 5 + 2)
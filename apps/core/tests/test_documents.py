@@ -0,0 +1,101 @@
+import json
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from ..benchmark import generate_dataset
+from ..models import Film, FilmDocument
+from ..serializers import FilmReadOnlySerializer
+from ..sync_data import load_resources
+from .test_api import make_character, make_film, make_planet, make_starship
+
+User = get_user_model()
+
+
+class FilmDocumentTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="pass1234", email="example12@email.com")
+        self.client.force_authenticate(user=self.user)
+
+        self.planet = make_planet()
+        self.character = make_character(planet=self.planet)
+        self.ship = make_starship(pilots=[self.character])
+        self.film = make_film(characters=[self.character], starships=[self.ship])
+
+    def test_film_reads_are_served_from_documents(self):
+        url = reverse("film-detail", args=[self.film.id])
+        response = self.client.get(url)
+        self.assertTrue(FilmDocument.objects.filter(film=self.film).exists())
+        self.assertEqual(response.content, JSONRenderer().render(FilmReadOnlySerializer(self.film).data))
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("film-list"))
+        self.assertEqual(response.data["results"][0]["starships"][0]["pilots"][0]["name"], "Thomas Gav")
+        self.assertFalse(any("core_character" in query["sql"] for query in queries.captured_queries))
+
+    def test_writes_rebuild_documents(self):
+        self.client.get(reverse("film-detail", args=[self.film.id]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse("character-detail", args=[self.character.id]), {"name": "Another dude"})
+
+        document = json.loads(FilmDocument.objects.get(film=self.film).document)
+        self.assertEqual(document["characters"][0]["name"], "Another dude")
+        response = self.client.get(reverse("film-detail", args=[self.film.id]))
+        self.assertEqual(response.data["starships"][0]["pilots"][0]["name"], "Another dude")
+
+    def test_writes_rebuild_only_the_films_embedding_the_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = make_film(title="Another Movie")
+        FilmDocument.objects.filter(film=other).update(document="{}")
+
+        self.planet.name = "Naboo"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.planet.save()
+        document = json.loads(FilmDocument.objects.get(film=self.film).document)
+        self.assertEqual(document["characters"][0]["planet"]["name"], "Naboo")
+        self.assertEqual(FilmDocument.objects.get(film=other).document, "{}")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.planet.delete()
+        document = json.loads(FilmDocument.objects.get(film=self.film).document)
+        self.assertIsNone(document["characters"][0]["planet"])
+        self.assertEqual(FilmDocument.objects.get(film=other).document, "{}")
+
+    def test_relation_changes_rebuild_the_films_embedding_the_row(self):
+        self.client.get(reverse("film-detail", args=[self.film.id]))
+        pilot = make_character(name="Another pilot")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pilot.starships.add(self.ship)
+        document = json.loads(FilmDocument.objects.get(film=self.film).document)
+        self.assertEqual(len(document["starships"][0]["pilots"]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pilot.starships.clear()
+        document = json.loads(FilmDocument.objects.get(film=self.film).document)
+        self.assertEqual(len(document["starships"][0]["pilots"]), 1)
+
+    def test_check_command_rebuilds_drifted_documents(self):
+        self.client.get(reverse("film-detail", args=[self.film.id]))
+        FilmDocument.objects.update(document="{}")
+
+        out = StringIO()
+        call_command("check_film_documents", "--dry-run", stdout=out)
+        self.assertIn("1 drifted", out.getvalue())
+        self.assertEqual(FilmDocument.objects.get().document, "{}")
+
+        call_command("check_film_documents", stdout=StringIO())
+        self.assertEqual(json.loads(FilmDocument.objects.get().document)["title"], "New Star Wars Movie")
+
+    def test_sync_builds_documents(self):
+        load_resources(generate_dataset(0.2))
+        self.assertEqual(FilmDocument.objects.count(), Film.objects.count())
@@ -0,0 +1,122 @@
+import uuid
+from datetime import date
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from ..graph import Graph, edges, get_graph
+from ..models import Character, DatasetVersion, Film, Planet
+from .test_api import BaseAPITestCase
+
+
+class GraphTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tatooine = Planet.objects.create(name="Tatooine")
+        self.naboo = Planet.objects.create(name="Naboo")
+        self.hoth = Planet.objects.create(name="Hoth")
+        self.luke = Character.objects.create(name="Luke Skywalker", planet=self.tatooine)
+        self.anakin = Character.objects.create(name="Anakin Skywalker", planet=self.tatooine)
+        self.leia = Character.objects.create(name="Leia Organa")
+        self.obi_wan = Character.objects.create(name="Obi-Wan Kenobi")
+        self.padme = Character.objects.create(name="Padmé Amidala", planet=self.naboo)
+        self.new_hope = Film.objects.create(title="A New Hope", episode_id=4, release_date=date(1977, 5, 25))
+        self.new_hope.characters.set([self.luke, self.leia, self.obi_wan])
+        self.phantom = Film.objects.create(title="The Phantom Menace", episode_id=1, release_date=date(1999, 5, 19))
+        self.phantom.characters.set([self.anakin, self.obi_wan, self.padme])
+
+    def get(self, name, params=None, pk=None):
+        return self.client.get(reverse(name, args=[pk] if pk else []), params)
+
+    def titles(self, response):
+        return [node["title"] for node in response.data["results"]]
+
+    def test_neighbours(self):
+        response = self.get("graph-neighbours", pk=self.luke.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(self.titles(response), ["Tatooine", "A New Hope"])
+
+        response = self.get("graph-neighbours", {"types": "film"}, pk=self.obi_wan.id)
+        self.assertCountEqual(self.titles(response), ["A New Hope", "The Phantom Menace"])
+        self.assertEqual(response.data["results"][0]["type"], "film")
+
+    def test_co_appearances(self):
+        response = self.get("graph-co-appearances", pk=self.obi_wan.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.titles(response), ["Anakin Skywalker", "Leia Organa", "Luke Skywalker", "Padmé Amidala"]
+        )
+        self.assertEqual({node["shared"] for node in response.data["results"]}, {1})
+
+        response = self.get("graph-co-appearances", {"via": "planet"}, pk=self.luke.id)
+        self.assertEqual(self.titles(response), ["Anakin Skywalker"])
+
+    def test_writes_rebuild_the_graph(self):
+        self.get("graph-co-appearances", pk=self.luke.id)
+        self.phantom.characters.add(self.luke)
+
+        response = self.get("graph-co-appearances", pk=self.luke.id)
+        self.assertEqual(response.data["results"][0]["title"], "Obi-Wan Kenobi")
+        self.assertEqual(response.data["results"][0]["shared"], 2)
+        self.assertIn("Padmé Amidala", self.titles(response))
+
+    def test_shortest_path(self):
+        response = self.get("graph-path", {"source": self.luke.id, "target": self.anakin.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["length"], 2)
+        self.assertEqual([node["title"] for node in response.data["path"]], ["Luke Skywalker", "Tatooine", "Anakin Skywalker"])
+
+        response = self.get("graph-path", {"source": self.luke.id, "target": self.anakin.id, "via": "film,character"})
+        self.assertEqual(
+            [node["title"] for node in response.data["path"]],
+            ["Luke Skywalker", "A New Hope", "Obi-Wan Kenobi", "The Phantom Menace", "Anakin Skywalker"],
+        )
+
+    def test_path_not_found(self):
+        response = self.get("graph-path", {"source": self.luke.id, "target": self.hoth.id})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.get("graph-path", {"source": self.luke.id, "target": uuid.uuid4()})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.get("graph-neighbours", pk=uuid.uuid4())
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get("graph-path", {"source": self.luke.id}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.get("graph-neighbours", {"types": "droid"}, pk=self.luke.id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.get("graph-neighbours", pk=self.luke.id)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_graph_is_reused_until_a_write(self):
+        graph = get_graph()
+        self.assertEqual(len(graph.targets), 2 * (6 + 3))
+        with CaptureQueriesContext(connection) as queries:
+            self.get("graph-neighbours", pk=self.luke.id)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if "core_" in query["sql"] and "core_datasetversion" not in query["sql"]
+        ])
+        self.assertIs(get_graph(), graph)
+
+        self.leia.save()
+        self.assertIsNot(get_graph(), graph)
+
+    def test_graph_follows_the_writes_of_other_processes(self):
+        graph = get_graph()
+        # committed by another worker, whose cache this one does not share
+        DatasetVersion.objects.update_or_create(pk=1, defaults={"version": 5})
+        self.assertIsNot(get_graph(), graph)
+
+    def test_links_to_rows_written_during_the_build_are_skipped(self):
+        # as if a character was linked between the node and the link queries
+        links = list(edges()) + [(uuid.uuid4(), self.new_hope.pk)]
+        with patch("apps.core.graph.edges", return_value=links):
+            graph = Graph(None)
+        self.assertEqual(len(graph.targets), 2 * (6 + 3))
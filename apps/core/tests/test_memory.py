@@ -0,0 +1,122 @@
+from unittest.mock import patch
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from ..benchmark import generate_dataset
+from ..memory import Snapshot, Table, get_snapshot
+from ..models import *
+from ..sync_data import load_resources
+from .test_api import BaseAPITestCase
+
+
+@override_settings(CORE_MEMORY_READS=True, CORE_RESPONSE_CACHE_TIMEOUT=0)
+class MemoryReadTests(BaseAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_resources(generate_dataset(0.3, seed=6))
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def core_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url, params)
+        # the dataset version is the only query of a read from the snapshot
+        return response, [
+            query for query in queries.captured_queries
+            if "core_" in query["sql"] and "core_datasetversion" not in query["sql"]
+        ]
+
+    def assertSameAsDatabase(self, url, params=None):
+        get_snapshot()
+        response, queries = self.core_queries(url, params)
+        self.assertEqual(queries, [])
+        with override_settings(CORE_MEMORY_READS=False):
+            expected = self.get(url, params)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response["ETag"], expected["ETag"])
+        return response
+
+    def test_lists(self):
+        for name in ["planet", "species", "character", "vehicle", "starship", "film"]:
+            self.assertSameAsDatabase(reverse(f"{name}-list"))
+        self.assertSameAsDatabase(reverse("character-list"), {"page": 2})
+
+    def test_retrieve(self):
+        for model, name in [(Character, "character"), (Film, "film"), (Starship, "starship")]:
+            self.assertSameAsDatabase(reverse(f"{name}-detail", args=[model.objects.first().pk]))
+
+    def test_fields_and_expand(self):
+        self.assertSameAsDatabase(reverse("film-list"), {"fields": "title,starships", "expand": "starships.pilots"})
+        self.assertSameAsDatabase(reverse("character-list"), {"expand": ""})
+        self.assertSameAsDatabase(reverse("species-list"), {"fields": "name,planet"})
+
+    def test_filters_and_ordering(self):
+        self.assertSameAsDatabase(reverse("planet-list"), {"population__gte": 1000000, "ordering": "-population"})
+        self.assertSameAsDatabase(reverse("character-list"), {"mass__isnull": "true", "ordering": "name"})
+        self.assertSameAsDatabase(reverse("starship-list"), {"ordering": "length,-name", "page": 2})
+
+    def test_search(self):
+        response = self.assertSameAsDatabase(reverse("character-list"), {"search": "character 1", "ordering": "name"})
+        self.assertTrue(response.data["count"])
+        response, queries = self.core_queries(reverse("starship-list"), {"search": "kuat"})
+        self.assertEqual(queries, [])
+        self.assertEqual(
+            response.data["count"], Starship.objects.filter(manufacturer="Kuat Drive Yards").count()
+        )
+
+    def test_not_found(self):
+        self.get(reverse("planet-list"))
+        response = self.client.get(reverse("planet-detail", args=[Film.objects.first().pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_request(self):
+        url = reverse("film-list")
+        etag = self.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_swap_the_snapshot(self):
+        snapshot = get_snapshot()
+        planet = Planet.objects.first()
+        response = self.client.patch(reverse("planet-detail", args=[planet.pk]), {"name": "Alderaan"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.get(reverse("planet-detail", args=[planet.pk]))
+        self.assertEqual(response.data["name"], "Alderaan")
+        self.assertIsNot(get_snapshot(), snapshot)
+
+    def test_writes_of_other_processes_swap_the_snapshot(self):
+        snapshot = get_snapshot()
+        self.assertIs(get_snapshot(), snapshot)
+
+        # committed by another worker, whose cache this one does not share
+        DatasetVersion.objects.update_or_create(pk=1, defaults={"version": 5})
+        self.assertIsNot(get_snapshot(), snapshot)
+
+    def test_falls_back_to_the_database(self):
+        get_snapshot()
+        for params in [{"pagination": "cursor"}, {"normalized": "true"}, {"ordering": "planet"}]:
+            response, queries = self.core_queries(reverse("character-list"), params)
+            self.assertTrue(queries)
+
+    def test_links_to_rows_written_during_the_load_are_skipped(self):
+        film = Film.objects.first()
+        late = Character.objects.create(name="Late dude")
+        film.characters.add(late)
+
+        # as if the character was created after its table was loaded
+        def load(model):
+            table = Table(model)
+            table.index.pop(late.pk, None)
+            return table
+        with patch("apps.core.memory.Table", side_effect=load):
+            snapshot = Snapshot(None)
+
+        position = snapshot.tables[Film].index[film.pk]
+        self.assertEqual(len(snapshot.links[(Character, "films")][position]), film.characters.count() - 1)
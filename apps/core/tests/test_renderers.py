@@ -0,0 +1,76 @@
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+
+from ..benchmark import generate_dataset
+from ..models import Film, Planet
+from ..serializers import FilmReadOnlySerializer
+from ..sync_data import load_resources
+from .test_api import BaseAPITestCase
+
+
+class FastJSONRendererTests(APITestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renders_like_the_drf_renderer(self):
+        self.assertSameBytes({
+            "id": uuid.uuid4(),
+            "date": date(1977, 5, 25),
+            "naive": datetime(1977, 5, 25, 10, 30, 0, 123456),
+            "aware": datetime(1977, 5, 25, 10, 30, tzinfo=timezone.utc),
+            "decimal": Decimal("1.50"),
+            "lazy": gettext_lazy("lazy"),
+            "text": "Alderaan \u2028 \u2029 é",
+            "nested": [1, 2.5, None, True, {"a": []}],
+        })
+
+    def test_renders_film_payload_like_the_drf_renderer(self):
+        load_resources(generate_dataset(0.2, seed=5))
+        self.assertSameBytes(FilmReadOnlySerializer(Film.objects.all(), many=True).data)
+
+    def test_indented_output_falls_back(self):
+        context = {"indent": 2}
+        data = {"name": "Tatooine"}
+        self.assertEqual(
+            FastJSONRenderer().render(data, renderer_context=context),
+            JSONRenderer().render(data, renderer_context=context),
+        )
+
+    def test_none_renders_empty(self):
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+
+class FastJSONParserTests(BaseAPITestCase):
+    def test_parses_json(self):
+        stream = BytesIO('{"name": "Hoth", "terrain": ["tundra"], "é": 1}'.encode())
+        self.assertEqual(FastJSONParser().parse(stream), {"name": "Hoth", "terrain": ["tundra"], "é": 1})
+
+    def test_invalid_json_raises_parse_error(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"name": '))
+
+    def test_json_request_round_trip(self):
+        data = {
+            "name": "Hoth", "rotation_period": "23", "orbital_period": "549", "diameter": "7200",
+            "climate": "frozen", "gravity": "1.1 standard", "terrain": "tundra", "surface_water": "100",
+            "population": "unknown",
+        }
+        response = self.client.post(reverse("planet-list"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["name"], "Hoth")
+        self.assertEqual(Planet.objects.get().diameter_value, 7200)
+
+    def test_invalid_json_request_is_400(self):
+        response = self.client.post(reverse("planet-list"), data=b'{"name": ', content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
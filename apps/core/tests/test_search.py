@@ -0,0 +1,160 @@
+from datetime import date
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from ..benchmark import generate_dataset
+from ..models import Film, Planet, SearchEntry, Starship
+from ..search import search
+from ..sync_data import load_resources
+from .test_api import BaseAPITestCase
+
+
+class SearchIndexTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.falcon = Starship.objects.create(name="Millennium Falcon", model="YT-1300 light freighter",
+                                              manufacturer="Corellian Engineering Corporation")
+        self.freighter = Starship.objects.create(name="Rebel transport", model="GR-75 medium transport",
+                                                 manufacturer="Gallofree Yards, Inc. (Falcon line)")
+        self.film = Film.objects.create(title="A New Hope", episode_id=4, release_date=date(1977, 5, 25),
+                                        opening_crawl="It is a period of civil war. Rebel spaceships...")
+
+    def ids(self, query, kinds=None):
+        return [object_id for kind, object_id, title, rank in search(query, kinds)]
+
+    def test_writes_update_the_index(self):
+        self.assertEqual(self.ids("millennium"), [self.falcon.id])
+
+        self.falcon.name = "Outrider"
+        self.falcon.save()
+        self.assertEqual(self.ids("millennium"), [])
+        self.assertEqual(self.ids("outrider"), [self.falcon.id])
+
+        self.falcon.delete()
+        self.assertEqual(self.ids("outrider"), [])
+        self.assertFalse(SearchEntry.objects.filter(object_id=self.falcon.id).exists())
+
+    def test_searches_other_fields_by_word_prefix(self):
+        self.assertEqual(self.ids("civil wa"), [self.film.id])
+        self.assertEqual(self.ids("corellian engin"), [self.falcon.id])
+        self.assertEqual(self.ids("GR-75"), [self.freighter.id])
+        self.assertEqual(self.ids("falcon millennium"), [self.falcon.id])
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.ids("falcon"), [self.falcon.id, self.freighter.id])
+
+    def test_kinds_and_limit(self):
+        Planet.objects.create(name="Falcon Prime")
+        self.assertEqual(len(search("falcon")), 3)
+        self.assertEqual(len(search("falcon", ["starship"], limit=1)), 1)
+        self.assertEqual({kind for kind, object_id, title, rank in search("falcon", ["planet"])}, {"planet"})
+
+    def test_queries_without_words_match_nothing(self):
+        self.assertEqual(search("  -- "), [])
+
+    @override_settings(CORE_SEARCH_BACKEND="apps.core.search.DatabaseSearchBackend")
+    def test_database_backend(self):
+        self.assertEqual(self.ids("falcon"), [self.falcon.id, self.freighter.id])
+        self.assertEqual(self.ids("civil wa"), [self.film.id])
+
+    def test_sync_indexes_the_loaded_rows(self):
+        load_resources(generate_dataset(0.2, seed=4))
+        for model in [Planet, Starship, Film]:
+            self.assertEqual(
+                SearchEntry.objects.filter(kind=model._meta.model_name).count(), model.objects.count()
+            )
+        self.assertEqual(
+            [kind for kind, object_id, title, rank in search("Starships 1", ["starship"], limit=1)], ["starship"]
+        )
+
+
+class SearchFilterTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.falcon = Starship.objects.create(name="Millennium Falcon", model="YT-1300 light freighter")
+        self.freighter = Starship.objects.create(name="Rebel transport", model="Falcon-class freighter")
+        Starship.objects.create(name="X-wing", model="T-65 X-wing")
+
+    def names(self, params):
+        response = self.client.get(reverse("starship-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["name"] for row in response.data["results"]]
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.names({"search": "falcon"}), ["Millennium Falcon", "Rebel transport"])
+        self.assertCountEqual(self.names({"search": "freigh"}), ["Millennium Falcon", "Rebel transport"])
+
+    def test_ordering_overrides_the_rank(self):
+        self.assertEqual(self.names({"search": "falcon", "ordering": "-name"}), ["Rebel transport", "Millennium Falcon"])
+
+    def test_no_match(self):
+        self.assertEqual(self.names({"search": "tie fighter"}), [])
+
+    def test_every_match_is_returned(self):
+        for index in range(12):
+            Starship.objects.create(name=f"Falcon {index}", model="Light freighter")
+        response = self.client.get(reverse("starship-list"), {"search": "falcon"})
+        self.assertEqual(response.data["count"], 14)
+        response = self.client.get(reverse("starship-export"), {"search": "falcon"})
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 14)
+
+    @override_settings(CORE_SEARCH_BACKEND="apps.core.search.DatabaseSearchBackend")
+    def test_database_backend_ranks(self):
+        self.assertEqual(self.names({"search": "falcon"}), ["Millennium Falcon", "Rebel transport"])
+        self.assertEqual(self.names({"search": "falcon", "ordering": "-name"}), ["Rebel transport", "Millennium Falcon"])
+
+    def test_search_does_not_scan_with_like(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.names({"search": "falcon"})
+        sql = [query["sql"] for query in queries.captured_queries if "silk_" not in query["sql"]]
+        self.assertTrue(any("core_searchentry_fts MATCH" in statement for statement in sql))
+        self.assertFalse(any("LIKE" in statement for statement in sql))
+
+
+class GlobalSearchTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tatooine = Planet.objects.create(name="Tatooine", climate="arid", terrain="desert")
+        self.falcon = Starship.objects.create(name="Millennium Falcon", model="YT-1300 light freighter")
+        for index in range(3):
+            Starship.objects.create(name=f"Tatooine skiff {index}", model="Bantha-II cargo skiff")
+
+    def search(self, params):
+        return self.client.get(reverse("search"), params)
+
+    def test_typed_ranked_hits(self):
+        response = self.search({"q": "tatooine"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 4)
+        first = response.data["results"][0]
+        self.assertEqual((first["type"], first["id"], first["title"]), ("planet", str(self.tatooine.id), "Tatooine"))
+        self.assertTrue(first["url"].endswith(reverse("planet-detail", args=[self.tatooine.id])))
+        ranks = [hit["rank"] for hit in response.data["results"]]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_limit_applies_per_type(self):
+        response = self.search({"q": "tatooine", "limit": 2})
+        self.assertEqual([hit["type"] for hit in response.data["results"]].count("starship"), 2)
+        self.assertEqual([hit["type"] for hit in response.data["results"]].count("planet"), 1)
+
+    def test_types(self):
+        response = self.search({"q": "tatooine", "types": "planet"})
+        self.assertEqual([hit["type"] for hit in response.data["results"]], ["planet"])
+
+    def test_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search({"q": "falcon"})
+        sql = [query["sql"] for query in queries.captured_queries if "core_" in query["sql"]]
+        self.assertEqual(len(sql), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.search({}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search({"q": "falcon", "types": "droid"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search({"q": "falcon", "limit": 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.search({"q": "falcon"}).status_code, status.HTTP_401_UNAUTHORIZED)
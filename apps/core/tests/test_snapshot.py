@@ -0,0 +1,53 @@
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from ..models import Character, Planet, Species, Starship, Film
+from .test_api import make_character, make_film, make_planet, make_starship
+
+
+class SnapshotTests(APITestCase):
+    def setUp(self):
+        planet = make_planet()
+        species = Species.objects.create(
+            name="Human", classification="mammal", designation="sentient", average_height="180",
+            skin_colors="fair", hair_colors="brown", eye_colors="brown", average_lifespan="120",
+            language="Galactic Basic", planet=planet
+        )
+        character = make_character(planet=planet)
+        character.species.set([species])
+        starship = make_starship(pilots=[character])
+        make_film(characters=[character], planets=[planet], starships=[starship])
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "snapshot.ndjson.gz")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_export_and_import_round_trip(self):
+        call_command("export_snapshot", self.path, stdout=StringIO())
+        for model in [Film, Starship, Character, Species, Planet]:
+            model.objects.all().delete()
+
+        call_command("import_snapshot", self.path, stdout=StringIO())
+
+        film = Film.objects.get()
+        self.assertEqual(film.release_date, date(2026, 5, 19))
+        self.assertEqual(film.characters.get().name, "Thomas Gav")
+        self.assertEqual(film.planets.get().name, "Tatooine")
+        self.assertEqual(film.starships.get().pilots.get().name, "Thomas Gav")
+        character = Character.objects.get()
+        self.assertEqual(character.planet.name, "Tatooine")
+        self.assertEqual(character.species.get().planet.name, "Tatooine")
+
+    def test_import_of_unchanged_snapshot_is_a_no_op(self):
+        call_command("export_snapshot", self.path, stdout=StringIO())
+        call_command("import_snapshot", self.path, stdout=StringIO())
+
+        out = StringIO()
+        call_command("import_snapshot", self.path, stdout=out)
+        self.assertIn("films: 0 created, 0 updated, 1 unchanged, 0 removed", out.getvalue())
@@ -0,0 +1,107 @@
+from datetime import date
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from ..benchmark import generate_dataset
+from ..cache import bump, generation_key, get_generations
+from ..models import Character, Film, Planet, Species, Starship
+from ..sync_data import load_resources
+from .test_api import BaseAPITestCase
+
+
+class StatsTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tatooine = Planet.objects.create(name="Tatooine", climate="arid", population="200000")
+        self.naboo = Planet.objects.create(name="Naboo", climate="temperate", population="4500000000")
+        Planet.objects.create(name="Hoth", climate="frozen", population="unknown")
+        Planet.objects.create(name="Dagobah", climate="temperate", population="unknown")
+        human = Species.objects.create(name="Human", classification="mammal")
+        self.luke = Character.objects.create(name="Luke Skywalker", planet=self.tatooine)
+        self.luke.species.set([human])
+        self.anakin = Character.objects.create(name="Anakin Skywalker", planet=self.tatooine)
+        self.anakin.species.set([human])
+        self.padme = Character.objects.create(name="Padmé Amidala", planet=self.naboo)
+        film = Film.objects.create(title="A New Hope", episode_id=4, release_date=date(1977, 5, 25))
+        film.characters.set([self.luke])
+        falcon = Starship.objects.create(name="Millennium Falcon", starship_class="Light freighter")
+        falcon.pilots.set([self.luke, self.anakin])
+        Starship.objects.create(name="Rebel transport", starship_class="Light freighter").pilots.set([self.luke])
+        Starship.objects.create(name="Star Destroyer", starship_class="Star Destroyer")
+
+    def stats(self, name):
+        response = self.client.get(reverse("stats-detail", args=[name]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_index(self):
+        response = self.client.get(reverse("stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["characters-per-planet"].endswith("/api/stats/characters-per-planet/"))
+
+    def test_characters_per_planet(self):
+        rows = self.stats("characters-per-planet")
+        self.assertEqual([(row["name"], row["count"]) for row in rows[:2]], [("Tatooine", 2), ("Naboo", 1)])
+        self.assertEqual(rows[0]["id"], self.tatooine.id)
+
+    def test_species_distribution(self):
+        self.assertEqual(
+            [(row["name"], row["classification"], row["count"]) for row in self.stats("species-distribution")],
+            [("Human", "mammal", 2)],
+        )
+
+    def test_films_per_character(self):
+        rows = self.stats("films-per-character")
+        self.assertEqual((rows[0]["name"], rows[0]["count"]), ("Luke Skywalker", 1))
+        self.assertEqual({row["count"] for row in rows[1:]}, {0})
+
+    def test_pilots_per_starship_class(self):
+        self.assertEqual(self.stats("pilots-per-starship-class"), [
+            {"starship_class": "Light freighter", "starships": 2, "pilots": 2},
+            {"starship_class": "Star Destroyer", "starships": 1, "pilots": 0},
+        ])
+
+    def test_population_per_climate(self):
+        self.assertEqual(self.stats("population-per-climate"), [
+            {"climate": "arid", "planets": 1, "population": 200000, "unknown": 0},
+            {"climate": "frozen", "planets": 1, "population": None, "unknown": 1},
+            {"climate": "temperate", "planets": 2, "population": 4500000000, "unknown": 1},
+        ])
+
+    def test_results_are_cached_until_a_write(self):
+        self.stats("characters-per-planet")
+        with CaptureQueriesContext(connection) as queries:
+            self.stats("characters-per-planet")
+        self.assertFalse([query for query in queries.captured_queries if "core_" in query["sql"]])
+
+        self.padme.planet = self.tatooine
+        self.padme.save()
+        self.assertEqual(self.stats("characters-per-planet")[0]["count"], 3)
+
+    def test_evicted_generation_does_not_serve_stale_results(self):
+        self.stats("characters-per-planet")
+
+        # counted again up to the same number after the eviction
+        generation = get_generations([Character])[0]
+        cache.delete(generation_key(Character))
+        Character.objects.filter(pk=self.padme.pk).update(planet=self.tatooine)
+        for _ in range(generation):
+            bump(Character)
+        self.assertEqual(self.stats("characters-per-planet")[0]["count"], 3)
+
+    def test_sync_invalidates(self):
+        self.stats("films-per-character")
+        load_resources(generate_dataset(0.1, seed=2))
+        self.assertEqual(len(self.stats("films-per-character")), Character.objects.count())
+
+    def test_unknown_statistic(self):
+        response = self.client.get(reverse("stats-detail", args=["droids-per-owner"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse("stats-detail", args=["characters-per-planet"]))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,9 +1,22 @@
+import json
+import tempfile
+from datetime import timedelta
 from unittest.mock import patch, Mock
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from ..models import Character, Starship, Film
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.utils import timezone
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from ..models import Character, Planet, Starship, Film, SyncJob
+from ..cache import get_generations
+from ..benchmark import StandInServer, generate_dataset, timed_sync
+from ..jobs import QUEUE_KEY, work
+from ..numbers import parse_number
+from ..sync_data import SWAPI_RESOURCES, SYNC_PHASES, bulk_upsert, fetch_resources, sync, sync_relation
 
 User = get_user_model()
 
@@ -46,12 +59,29 @@ mock_films_response = [{
     "release_date": "2026-05-19",
     "characters": ["https://swapi.info/api/people/1/"],
     "starships": ["https://swapi.info/api/starships/1/"],
+    "url": "https://swapi.info/api/films/1/"
 }]
 
 
-def make_mock_response(json_data, status_code):
+mock_planets_response = [{
+    "name": "Tatooine",
+    "rotation_period": "23",
+    "orbital_period": "304",
+    "diameter": "10465",
+    "climate": "arid",
+    "gravity": "1 standard",
+    "terrain": "desert",
+    "surface_water": "1",
+    "population": "200000",
+    "url": "https://swapi.info/api/planets/1/"
+}]
+
+
+def make_mock_response(json_data, status_code, headers=None):
     mock = Mock()
     mock.status_code = status_code
+    mock.headers = headers or {}
+    mock.content = json.dumps(json_data).encode()
     mock.json.return_value = json_data
     mock.raise_for_status.side_effect = (
         None if status_code == 200 else Exception(f"HTTP {status_code}")
@@ -59,56 +89,151 @@ def make_mock_response(json_data, status_code):
     return mock
 
 
+def executed(queries):
+    # silk profiles the test client requests and adds its own EXPLAIN statements
+    return [query for query in queries.captured_queries if not query["sql"].startswith("EXPLAIN")]
+
+
+def make_mock_session(responses):
+    # every resource that is not given explicitly comes back as an empty list
+    def get(url, **kwargs):
+        resource = url.rstrip("/").rsplit("/", 1)[-1]
+        return responses.get(resource, make_mock_response([], 200))
+
+    mock = Mock()
+    mock.get.side_effect = get
+    return mock
+
+
+@override_settings(SYNC_JOBS_EAGER=True, SWAPI_CACHE_DIR=None)
 class SyncTests(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username="testuser", password="pass1234", email="example12@email.com")
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
-    @patch("apps.core.sync_data.requests.get")
-    def test_sync_success(self, mock_get):
+    def run_sync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("sync"))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["message"], "Star Wars data sync has been queued!")
+        return self.client.get(reverse("sync-job", args=[response.data["job"]["id"]]))
 
-        mock_get.side_effect = [
-            make_mock_response(mock_characters_response, 200),
-            make_mock_response(mock_starships_response, 200),
-            make_mock_response(mock_films_response, 200),
-        ]
+    @patch("apps.core.sync_data.get_session")
+    def test_sync_success(self, mock_get_session):
 
-        url = reverse("sync")
-        response = self.client.post(url)
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+            "starships": make_mock_response(mock_starships_response, 200),
+            "films": make_mock_response(mock_films_response, 200),
+        })
+
+        response = self.run_sync()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["message"], "Star Wars data synced successfully!")
+        self.assertEqual(response.data["status"], SyncJob.SUCCEEDED)
+        self.assertEqual(set(response.data["phases"].values()), {"completed"})
 
         self.assertEqual(Character.objects.count(), 1)
         self.assertEqual(Starship.objects.count(), 1)
         self.assertEqual(Film.objects.count(), 1)
+        self.assertEqual(Starship.objects.get().pilots.get().name, "Thomas Gav")
+        self.assertEqual(Film.objects.get().characters.get().name, "Thomas Gav")
+        self.assertEqual(response.data["report"]["people"], {"created": 1, "updated": 0, "unchanged": 0, "removed": 0})
 
-    @patch("apps.core.sync_data.requests.get")
-    def test_sync_fail(self, mock_get):
+    @patch("apps.core.sync_data.get_session")
+    def test_sync_unchanged_data_is_skipped(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+            "starships": make_mock_response(mock_starships_response, 200),
+            "films": make_mock_response(mock_films_response, 200),
+        })
+        self.run_sync()
+        film_updated_at = Film.objects.get().updated_at
 
-        mock_get.side_effect = [
-            make_mock_response(mock_characters_response, 200),
-            make_mock_response(mock_starships_response, 400),
-            make_mock_response(mock_films_response, 200),
-        ]
+        response = self.run_sync()
+        self.assertEqual(response.data["status"], SyncJob.SUCCEEDED)
+        for resource in ["people", "starships", "films"]:
+            self.assertEqual(response.data["report"][resource], {"created": 0, "updated": 0, "unchanged": 1, "removed": 0})
+        self.assertEqual(Film.objects.get().updated_at, film_updated_at)
+        self.assertEqual(Film.objects.get().characters.count(), 1)
 
-        url = reverse("sync")
-        response = self.client.post(url)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data["message"], "Syncing of data from SWAPI has failed!")
+    @patch("apps.core.sync_data.get_session")
+    def test_sync_removes_rows_gone_upstream(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+        })
+        self.run_sync()
+
+        mock_get_session.return_value = make_mock_session({})
+        response = self.run_sync()
+        self.assertEqual(response.data["report"]["people"]["removed"], 1)
+        self.assertEqual(Character.objects.count(), 0)
+
+    @patch("apps.core.sync_data.get_session")
+    def test_sync_relinks_recreated_targets(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "planets": make_mock_response(mock_planets_response, 200),
+            "people": make_mock_response(
+                [dict(mock_characters_response[0], homeworld="https://swapi.info/api/planets/1/")], 200
+            ),
+            "films": make_mock_response([dict(mock_films_response[0], planets=["https://swapi.info/api/planets/1/"])], 200),
+        })
+        self.run_sync()
+        Planet.objects.all().delete()
+
+        response = self.run_sync()
+        self.assertEqual(response.data["report"]["planets"]["created"], 1)
+        self.assertEqual(response.data["report"]["people"]["updated"], 1)
+        self.assertEqual(response.data["report"]["films"]["updated"], 1)
+        self.assertEqual(Character.objects.get().planet.name, "Tatooine")
+        self.assertEqual(Film.objects.get().planets.get().name, "Tatooine")
+
+    @patch("apps.core.sync_data.get_session")
+    def test_sync_restores_local_changes(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+            "films": make_mock_response(mock_films_response, 200),
+        })
+        self.run_sync()
+        character = Character.objects.get()
+        response = self.client.patch(reverse("character-detail", args=[character.id]), {"name": "Local name"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        Character.objects.create(name="Extra dude").films.add(Film.objects.get())
+
+        response = self.run_sync()
+        self.assertEqual(response.data["report"]["people"]["updated"], 1)
+        self.assertEqual(response.data["report"]["films"]["updated"], 1)
+        self.assertEqual(Character.objects.get(pk=character.pk).name, "Thomas Gav")
+        self.assertEqual(Film.objects.get().characters.get().name, "Thomas Gav")
+
+    @patch("apps.core.sync_data.get_session")
+    def test_sync_fail(self, mock_get_session):
+
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+            "starships": make_mock_response(mock_starships_response, 400),
+            "films": make_mock_response(mock_films_response, 200),
+        })
+
+        response = self.run_sync()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], SyncJob.FAILED)
+        self.assertEqual(response.data["error"], "Syncing of data from SWAPI has failed!")
+        self.assertEqual(response.data["phases"]["fetch"], "failed")
 
         self.assertEqual(Character.objects.count(), 0)
         self.assertEqual(Starship.objects.count(), 0)
         self.assertEqual(Film.objects.count(), 0)
 
-    @patch("apps.core.sync_data.requests.get")
-    def test_sync_fail_unauthenticated(self, mock_get):
+    @patch("apps.core.sync_data.get_session")
+    def test_sync_fail_unauthenticated(self, mock_get_session):
 
-        mock_get.side_effect = [
-            make_mock_response(mock_characters_response, 200),
-            make_mock_response(mock_starships_response, 200),
-            make_mock_response(mock_films_response, 200),
-        ]
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+            "starships": make_mock_response(mock_starships_response, 200),
+            "films": make_mock_response(mock_films_response, 200),
+        })
         client = APIClient()
         url = reverse("sync")
         response = client.post(url)
@@ -116,4 +241,288 @@ class SyncTests(APITestCase):
 
         self.assertEqual(Character.objects.count(), 0)
         self.assertEqual(Starship.objects.count(), 0)
-        self.assertEqual(Film.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Film.objects.count(), 0)
+        self.assertEqual(SyncJob.objects.count(), 0)
+
+    def test_concurrent_sync_requests_attach_to_running_job(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            first = self.client.post(reverse("sync"))
+            second = self.client.post(reverse("sync"))
+
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.data["message"], "A Star Wars data sync is already in progress!")
+        self.assertEqual(second.data["job"]["id"], first.data["job"]["id"])
+        self.assertEqual(SyncJob.objects.count(), 1)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_stale_sync_job_does_not_block_new_syncs(self):
+        stale = SyncJob.objects.create(status=SyncJob.RUNNING, started_at=timezone.now() - timedelta(days=1))
+
+        with self.captureOnCommitCallbacks():
+            response = self.client.post(reverse("sync"))
+
+        self.assertNotEqual(response.data["job"]["id"], str(stale.id))
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, SyncJob.FAILED)
+
+    def test_long_queued_job_is_timed_from_its_start(self):
+        job = SyncJob.objects.create(status=SyncJob.RUNNING, started_at=timezone.now())
+        SyncJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(days=1))
+
+        with self.captureOnCommitCallbacks():
+            response = self.client.post(reverse("sync"))
+
+        self.assertEqual(response.data["job"]["id"], str(job.id))
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.RUNNING)
+
+    @override_settings(SYNC_JOBS_EAGER=False, SYNC_JOBS_BROKER_URL="redis://localhost:6379/0")
+    @patch("apps.core.jobs.get_broker")
+    def test_job_that_cannot_be_queued_fails(self, mock_get_broker):
+        mock_get_broker.return_value.rpush.side_effect = ConnectionError("broker is down")
+
+        with self.assertLogs("apps.core.jobs", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("sync"))
+
+        job = SyncJob.objects.get(pk=response.data["job"]["id"])
+        self.assertEqual(job.status, SyncJob.FAILED)
+        self.assertIn("broker is down", job.error)
+
+    @patch("apps.core.jobs.run_job")
+    @patch("apps.core.jobs.get_broker")
+    def test_worker_keeps_running_after_a_failed_job(self, mock_get_broker, mock_run_job):
+        broken, next_job = SyncJob.objects.create(), SyncJob.objects.create()
+        mock_get_broker.return_value.blpop.side_effect = [
+            (QUEUE_KEY.encode(), str(broken.pk).encode()),
+            (QUEUE_KEY.encode(), str(next_job.pk).encode()),
+            KeyboardInterrupt,
+        ]
+        mock_run_job.side_effect = [DatabaseError("connection lost"), None]
+
+        with self.assertLogs("apps.core.jobs", "ERROR"), self.assertRaises(KeyboardInterrupt):
+            work()
+
+        self.assertEqual(mock_run_job.call_count, 2)
+        broken.refresh_from_db()
+        self.assertEqual(broken.status, SyncJob.FAILED)
+        self.assertEqual(broken.error, "connection lost")
+
+    def test_sync_job_status_unauthenticated(self):
+        job = SyncJob.objects.create()
+        client = APIClient()
+        response = client.get(reverse("sync-job", args=[job.id]))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SWAPI_CACHE_DIR=None)
+class FetchResourcesTests(APITestCase):
+    @patch("apps.core.sync_data.get_session")
+    def test_fetch_resources_fetches_every_resource(self, mock_get_session):
+        session = make_mock_session({"people": make_mock_response(mock_characters_response, 200)})
+        mock_get_session.return_value = session
+
+        resources, pending, cache = fetch_resources()
+
+        self.assertEqual(set(resources), set(SWAPI_RESOURCES))
+        self.assertEqual(resources["people"], mock_characters_response)
+        self.assertEqual(session.get.call_count, len(SWAPI_RESOURCES))
+        for call in session.get.call_args_list:
+            self.assertIn("timeout", call.kwargs)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(SWAPI_CACHE_DIR=directory.name, SWAPI_CACHE_TTL=0)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    @patch("apps.core.sync_data.get_session")
+    def test_not_modified_resources_are_skipped(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200, {"ETag": '"people-v1"'}),
+        })
+        sync()
+
+        session = make_mock_session({"people": make_mock_response(None, 304)})
+        mock_get_session.return_value = session
+        with CaptureQueriesContext(connection) as queries:
+            report = sync()
+
+        self.assertEqual(report["people"], {"created": 0, "updated": 0, "unchanged": 1, "removed": 0})
+        people_call = next(call for call in session.get.call_args_list if "people" in call.args[0])
+        self.assertEqual(people_call.kwargs["headers"], {"If-None-Match": '"people-v1"'})
+        # the unchanged people are mapped with one select and never rewritten
+        character_queries = [query["sql"] for query in executed(queries) if "core_character" in query["sql"]]
+        self.assertEqual(len(character_queries), 1)
+        self.assertTrue(character_queries[0].startswith("SELECT"))
+
+    @patch("apps.core.sync_data.get_session")
+    def test_unchanged_body_is_not_parsed(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+        })
+        sync()
+
+        response = make_mock_response(mock_characters_response, 200)
+        mock_get_session.return_value = make_mock_session({"people": response})
+        report = sync()
+
+        self.assertEqual(report["people"]["unchanged"], 1)
+        response.json.assert_not_called()
+
+    @patch("apps.core.sync_data.get_session")
+    def test_missing_rows_are_reloaded_from_the_cached_body(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+        })
+        sync()
+        Character.objects.all().delete()
+
+        mock_get_session.return_value = make_mock_session({"people": make_mock_response(None, 304)})
+        report = sync()
+
+        self.assertEqual(report["people"]["created"], 1)
+        self.assertEqual(Character.objects.count(), 1)
+
+    @patch("apps.core.sync_data.get_session")
+    def test_local_changes_are_reloaded_from_the_cached_body(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+        })
+        sync()
+        character = Character.objects.get()
+        character.name = "Local name"
+        character.save()
+
+        mock_get_session.return_value = make_mock_session({"people": make_mock_response(None, 304)})
+        report = sync()
+
+        self.assertEqual(report["people"]["updated"], 1)
+        self.assertEqual(Character.objects.get().name, "Thomas Gav")
+
+    @patch("apps.core.sync_data.get_session")
+    def test_fresh_entries_skip_the_request(self, mock_get_session):
+        mock_get_session.return_value = make_mock_session({
+            "people": make_mock_response(mock_characters_response, 200),
+        })
+        sync()
+
+        session = make_mock_session({})
+        mock_get_session.return_value = session
+        with override_settings(SWAPI_CACHE_TTL=60):
+            report = sync()
+
+        session.get.assert_not_called()
+        self.assertEqual(report["people"]["unchanged"], 1)
+
+
+class BulkUpsertTests(APITestCase):
+    def test_bulk_upsert_creates_and_updates(self):
+        existing = Character.objects.create(
+            name="Thomas Gav", height="170", mass="80", hair_color="Black", skin_color="Fair",
+            eye_color="Brown", birth_year="1997", gender="Male"
+        )
+        items = mock_characters_response + [dict(
+            mock_characters_response[0], name="Another dude", url="https://swapi.info/api/people/2/"
+        )]
+
+        with CaptureQueriesContext(connection) as queries:
+            character_map, changed, stats = bulk_upsert(Character, items, "name", lambda item: {"height": item["height"]})
+
+        # one select, one insert and one update regardless of the number of rows
+        self.assertEqual(len(executed(queries)), 3)
+
+        self.assertEqual(Character.objects.count(), 2)
+        self.assertEqual(character_map["https://swapi.info/api/people/1/"].pk, existing.pk)
+        existing.refresh_from_db()
+        self.assertEqual(existing.height, "180")
+        self.assertEqual(existing.height_value, 180)
+        self.assertEqual(existing.swapi_url, "https://swapi.info/api/people/1/")
+
+    def test_bulk_upsert_renames_by_url(self):
+        bulk_upsert(Character, mock_characters_response, "name", lambda item: {"height": item["height"]})
+        renamed = [dict(mock_characters_response[0], name="Thomas Gavalas")]
+
+        character_map, changed, stats = bulk_upsert(Character, renamed, "name", lambda item: {"height": item["height"]})
+
+        self.assertEqual(stats, {"created": 0, "updated": 1, "unchanged": 0, "removed": 0})
+        self.assertEqual(Character.objects.get().name, "Thomas Gavalas")
+
+    def test_bulk_upsert_keeps_local_rows(self):
+        local = Character.objects.create(
+            name="Local dude", height="170", mass="80", hair_color="Black", skin_color="Fair",
+            eye_color="Brown", birth_year="1997", gender="Male"
+        )
+
+        character_map, changed, stats = bulk_upsert(Character, [], "name", lambda item: {})
+
+        self.assertEqual(stats["removed"], 0)
+        self.assertTrue(Character.objects.filter(pk=local.pk).exists())
+
+
+class SyncRelationTests(APITestCase):
+    def test_sync_relation_replaces_links(self):
+        film = Film.objects.create(
+            title="New Star Wars Movie", episode_id=12, opening_crawl="In a galaxy far far way ......",
+            director="Christopher Nolan", producer="Unknown", release_date="2026-05-19"
+        )
+        kept, dropped, added = [
+            Character.objects.create(
+                name=name, height="180", mass="85", hair_color="Black", skin_color="Fair",
+                eye_color="Brown", birth_year="1997", gender="Male"
+            )
+            for name in ["Kept dude", "Dropped dude", "Added dude"]
+        ]
+        film.characters.set([kept, dropped])
+
+        with CaptureQueriesContext(connection) as queries:
+            sync_relation(Film, "characters", {film.pk: {kept.pk, added.pk}})
+
+        # one select, one delete and one insert for the whole through table
+        self.assertEqual(len(executed(queries)), 3)
+        self.assertEqual(set(film.characters.all()), {kept, added})
+
+
+@override_settings(SWAPI_CACHE_DIR=None)
+class StandInServerTests(APITestCase):
+    def test_sync_from_stand_in_server(self):
+        with StandInServer() as server:
+            dataset = generate_dataset(1, base_url=server.base_url)
+            server.publish(dataset)
+            cold = timed_sync(server.base_url)
+            warm = timed_sync(server.base_url)
+
+        self.assertEqual(Character.objects.count(), len(dataset["people"]))
+        self.assertEqual(Film.objects.count(), len(dataset["films"]))
+        self.assertEqual(
+            Film.objects.get(title="Film 1").characters.count(), len(dataset["films"][0]["characters"])
+        )
+        self.assertEqual(cold["report"]["films"]["created"], len(dataset["films"]))
+        self.assertEqual(warm["report"]["films"]["unchanged"], len(dataset["films"]))
+        self.assertEqual(set(warm["phases"]), set(SYNC_PHASES))
+
+    def test_sync_invalidates_only_when_data_changed(self):
+        with StandInServer() as server:
+            server.publish(generate_dataset(0.1, base_url=server.base_url))
+            timed_sync(server.base_url)
+            generations = get_generations([Film])
+            timed_sync(server.base_url)
+            self.assertEqual(get_generations([Film]), generations)
+
+            dataset = generate_dataset(0.1, base_url=server.base_url)
+            dataset["films"][0]["producer"] = "Someone else"
+            server.publish(dataset)
+            timed_sync(server.base_url)
+            self.assertGreater(get_generations([Film])[0], generations[0])
+
+
+class ParseNumberTests(SimpleTestCase):
+    def test_parse_number(self):
+        self.assertEqual(parse_number("1,358"), 1358)
+        self.assertEqual(parse_number("34.37"), 34.37)
+        self.assertEqual(parse_number("12 km"), 12000)
+        self.assertIsNone(parse_number("unknown"))
+        self.assertIsNone(parse_number("n/a"))
+        self.assertIsNone(parse_number("30-165"))
@@ -17,4 +17,11 @@ router.register(r'planet', PlanetViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path("sync/", SyncView.as_view(), name="sync"),
+    path("sync/<uuid:pk>/", SyncJobView.as_view(), name="sync-job"),
+    path("search/", SearchView.as_view(), name="search"),
+    path("stats/", StatsView.as_view(), name="stats"),
+    path("stats/<slug:name>/", StatsDetailView.as_view(), name="stats-detail"),
+    path("graph/path/", PathView.as_view(), name="graph-path"),
+    path("graph/<uuid:pk>/neighbours/", NeighboursView.as_view(), name="graph-neighbours"),
+    path("graph/<uuid:pk>/co-appearances/", CoAppearancesView.as_view(), name="graph-co-appearances"),
 ]
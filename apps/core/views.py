@@ -1,44 +1,190 @@
-from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
+from rest_framework.generics import RetrieveAPIView
 from rest_framework.response import Response
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import *
 from .serializers import *
-from .pagination import StandardResultsSetPagination
-from .sync_data import sync
+from .filters import (
+    CharacterFilterSet, IndexedSearchFilter, NumericOrderingFilter, PlanetFilterSet, StarshipFilterSet, VehicleFilterSet
+)
+from .pagination import SelectableResultsSetPagination
+from .cache import CachedResponseMixin, ConditionalResponseMixin
+from .expansion import ExpandableViewSetMixin
+from .export import ExportViewSetMixin
+from .compiled import CompiledReadMixin
+from .documents import FilmDocumentMixin
+from .memory import MemoryReadMixin
+from .jobs import request_sync
+from .search import search
+from .graph import get_graph
+from .stats import STATS, get_stats
 
 
 class SyncView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        sync()
-        return Response({"message": "Star Wars data synced successfully!"}, status=status.HTTP_200_OK)
+        job, created = request_sync()
+        if created:
+            message = "Star Wars data sync has been queued!"
+        else:
+            message = "A Star Wars data sync is already in progress!"
+        return Response({
+            "message": message,
+            "job": SyncJobSerializer(job).data,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class SyncJobView(RetrieveAPIView):
+    queryset = SyncJob.objects.all()
+    serializer_class = SyncJobSerializer
+    permission_classes = [IsAuthenticated]
+
+
+class SearchView(APIView):
+    # typed hits of every resource, ranked, from one lookup of the search index
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        hits = [
+            {
+                "type": kind,
+                "id": object_id,
+                "title": title,
+                "rank": rank,
+                "url": request.build_absolute_uri(reverse(f"{kind}-detail", args=[object_id])),
+            }
+            for kind, object_id, title, rank in search(params["q"], params.get("types"), params["limit"])
+        ]
+        return Response({
+            "count": len(hits),
+            "results": SearchHitSerializer(hits, many=True).data,
+        })
+
+
+class GraphView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_query(self, serializer_class):
+        query = serializer_class(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        return query.validated_data
+
+    def get_node(self, graph, pk):
+        node = graph.node(pk)
+        if node is None:
+            raise NotFound("No object with this id.")
+        return node
+
+    def node_data(self, graph, node, **extra):
+        kind, pk = graph.kind(node), graph.ids[node]
+        return {
+            **GraphNodeSerializer({
+                "type": kind,
+                "id": pk,
+                "title": graph.titles[node],
+                "url": self.request.build_absolute_uri(reverse(f"{kind}-detail", args=[pk])),
+            }).data,
+            **extra,
+        }
+
+
+class NeighboursView(GraphView):
+    # the objects directly linked to an object, optionally only of some ?types=
+    def get(self, request, pk):
+        params = self.get_query(NeighboursQuerySerializer)
+        graph = get_graph()
+        node = self.get_node(graph, pk)
+        neighbours = graph.neighbours(node, params.get("types"))
+        return Response({
+            "count": len(neighbours),
+            "results": [self.node_data(graph, other) for other in neighbours],
+        })
+
+
+class CoAppearancesView(GraphView):
+    # the objects of the same type sharing ?via= objects (films by default) with an object
+    def get(self, request, pk):
+        params = self.get_query(CoAppearancesQuerySerializer)
+        graph = get_graph()
+        node = self.get_node(graph, pk)
+        co_appearances = graph.co_appearances(node, params["via"])
+        return Response({
+            "count": len(co_appearances),
+            "results": [self.node_data(graph, other, shared=shared) for other, shared in co_appearances],
+        })
+
+
+class PathView(GraphView):
+    # the shortest chain of links between two objects, only through the ?via= types when given
+    def get(self, request):
+        params = self.get_query(PathQuerySerializer)
+        graph = get_graph()
+        source, target = self.get_node(graph, params["source"]), self.get_node(graph, params["target"])
+        path = graph.shortest_path(source, target, params.get("via"))
+        if path is None:
+            raise NotFound("No path links these objects.")
+        return Response({
+            "length": len(path) - 1,
+            "path": [self.node_data(graph, node) for node in path],
+        })
+
+
+class StatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({
+            name: request.build_absolute_uri(reverse("stats-detail", args=[name])) for name in STATS
+        })
+
+
+class StatsDetailView(APIView):
+    # aggregates computed by the database, cached until the data changes
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, name):
+        if name not in STATS:
+            raise NotFound("Unknown statistic.")
+        rows = get_stats(name)
+        return Response({
+            "count": len(rows),
+            "results": rows,
+        })
+
+
+class CoreModelViewSet(
+    CachedResponseMixin, MemoryReadMixin, ConditionalResponseMixin, CompiledReadMixin, ExportViewSetMixin,
+    ExpandableViewSetMixin, viewsets.ModelViewSet
+):
+    pass
 
 
-class PlanetViewSet(viewsets.ModelViewSet):
+class PlanetViewSet(CoreModelViewSet):
     queryset = Planet.objects.all()
+    filterset_class = PlanetFilterSet
     serializer_class = PlanetSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    search_fields = ['name']
-    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, NumericOrderingFilter, IndexedSearchFilter]
+    pagination_class = SelectableResultsSetPagination
 
 
-class SpeciesViewSet(viewsets.ModelViewSet):
-    queryset = Species.objects.select_related("planet")
-    # queryset = Species.objects.all()
+class SpeciesViewSet(CoreModelViewSet):
+    queryset = Species.objects.all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    search_fields = ['name']
-    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, NumericOrderingFilter, IndexedSearchFilter]
+    pagination_class = SelectableResultsSetPagination
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in self.read_actions:
             return SpeciesReadOnlySerializer
         return SpeciesSerializer
 
@@ -70,16 +216,15 @@ class SpeciesViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
 
-class CharacterViewSet(viewsets.ModelViewSet):
-    queryset = Character.objects.select_related("planet").prefetch_related("species")
-    # queryset = Character.objects.all()
+class CharacterViewSet(CoreModelViewSet):
+    queryset = Character.objects.all()
+    filterset_class = CharacterFilterSet
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    search_fields = ['name']
-    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, NumericOrderingFilter, IndexedSearchFilter]
+    pagination_class = SelectableResultsSetPagination
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in self.read_actions:
             return CharacterReadOnlySerializer
         return CharacterSerializer
 
@@ -111,21 +256,15 @@ class CharacterViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
 
-class VehicleViewSet(viewsets.ModelViewSet):
-    queryset = Vehicle.objects.all().prefetch_related(
-        Prefetch(
-            "pilots",
-            queryset=Character.objects.select_related("planet").prefetch_related("species")
-        )
-    )
-    # queryset = Vehicle.objects.all()
+class VehicleViewSet(CoreModelViewSet):
+    queryset = Vehicle.objects.all()
+    filterset_class = VehicleFilterSet
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    search_fields = ['name']
-    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, NumericOrderingFilter, IndexedSearchFilter]
+    pagination_class = SelectableResultsSetPagination
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in self.read_actions:
             return VehicleReadOnlySerializer
         return VehicleSerializer
 
@@ -157,21 +296,15 @@ class VehicleViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
 
-class StarshipViewSet(viewsets.ModelViewSet):
-    queryset = Starship.objects.all().prefetch_related(
-        Prefetch(
-            "pilots",
-            queryset=Character.objects.select_related("planet").prefetch_related("species")
-        )
-    )
-    # queryset = Starship.objects.all()
+class StarshipViewSet(CoreModelViewSet):
+    queryset = Starship.objects.all()
+    filterset_class = StarshipFilterSet
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    search_fields = ['name']
-    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, NumericOrderingFilter, IndexedSearchFilter]
+    pagination_class = SelectableResultsSetPagination
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in self.read_actions:
             return StarshipReadOnlySerializer
         return StarshipSerializer
 
@@ -203,65 +336,14 @@ class StarshipViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
 
-class FilmViewSet(viewsets.ModelViewSet):
-    queryset = Film.objects.prefetch_related(
-        # Prefetch characters and their related data
-        Prefetch(
-            "characters",
-            queryset=Character.objects.select_related("planet").prefetch_related(
-                # Prefetch species and their related planet
-                Prefetch(
-                    "species",
-                    queryset=Species.objects.select_related("planet")
-                )
-            )
-        ),
-        # Prefetch planets (top-level relationship to Film)
-        "planets",
-        # Prefetch starships and their pilots, and the pilots' related data
-        Prefetch(
-            "starships",
-            queryset=Starship.objects.prefetch_related(
-                Prefetch(
-                    "pilots",
-                    queryset=Character.objects.select_related("planet").prefetch_related(
-                        Prefetch(
-                            "species",
-                            queryset=Species.objects.select_related("planet")
-                        )
-                    )
-                )
-            )
-        ),
-        # Prefetch vehicles and their pilots, and the pilots' related data
-        Prefetch(
-            "vehicles",
-            queryset=Vehicle.objects.prefetch_related(
-                Prefetch(
-                    "pilots",
-                    queryset=Character.objects.select_related("planet").prefetch_related(
-                        Prefetch(
-                            "species",
-                            queryset=Species.objects.select_related("planet")
-                        )
-                    )
-                )
-            )
-        ),
-        # Prefetch species and their related planet
-        Prefetch(
-            "species",
-            queryset=Species.objects.select_related("planet")
-        )
-    )
-    # queryset = Film.objects.all()
+class FilmViewSet(FilmDocumentMixin, CoreModelViewSet):
+    queryset = Film.objects.all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    search_fields = ['title']
-    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend, NumericOrderingFilter, IndexedSearchFilter]
+    pagination_class = SelectableResultsSetPagination
 
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in self.read_actions:
             return FilmReadOnlySerializer
         return FilmSerializer
 